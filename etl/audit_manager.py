@@ -1,20 +1,41 @@
-import sqlite3
+import json
+import threading
 import uuid
+from contextlib import contextmanager
 from datetime import datetime
 import config
-import os
+from spans import Span
 
 class AuditManager:
-    def __init__(self):
+    """Pipeline logging and watermark state in audit.db.
+    
+    A single long-lived connection (WAL mode, busy timeout) is shared by all
+    threads behind a lock. A step's STARTED row is committed as soon as the step
+    starts (log_start), so a step killed midway still shows as unfinished. The
+    other execution log writes are buffered and flushed in one transaction when a
+    step ends (log_end), whether it succeeded or failed, and on close(). Watermark
+    and file state updates are committed immediately, since they must never lag
+    behind the data they describe.
+    Sub-steps of a step (read/transform/write of a table, see spans.py) are logged
+    to pipeline_span_log under the step's execution_id, buffered the same way, as
+    are the data quality rule counts (data_quality_log). The per-day reconciliation
+    sketches (reconciliation_sketch) and the table catalog (table_catalog) are
+    committed immediately, like watermarks.
+    A batch_id can be given to log under an earlier batch (etl_pipeline.py --resume).
+    """
+    def __init__(self, batch_id=None):
         self.db_path = config.AUDIT_DB_PATH
+        self._lock = threading.RLock()
+        self._pending_logs = []
+        self._conn = None
         self._ensure_audit_db()
-        self.batch_id = str(uuid.uuid4())
-        
+        self.batch_id = batch_id or str(uuid.uuid4())
+
     def _ensure_audit_db(self):
         """Creates the audit table if it doesn't exist."""
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # WAL mode and the busy timeout come from config.SQLITE_PRAGMAS
+        self._conn = config.get_db_connection(self.db_path)
+        cursor = self._conn.cursor()
         
         # Pipeline Log Table
         cursor.execute("""
@@ -40,65 +61,298 @@ class AuditManager:
             );
         """)
         
-        conn.commit()
-        conn.close()
+        # Source File State Table (change detection for incremental loads)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS source_file_state (
+                file_name TEXT PRIMARY KEY,
+                file_size INTEGER,
+                file_mtime REAL,
+                checksum TEXT,
+                last_batch_id TEXT
+            );
+        """)
+        
+        # Span Table (sub-steps of a logged step, see spans.Span)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS pipeline_span_log (
+                span_id TEXT PRIMARY KEY,
+                execution_id TEXT,
+                step TEXT,
+                table_name TEXT,
+                status TEXT,
+                start_time TIMESTAMP,
+                duration_seconds REAL,
+                rows_in INTEGER,
+                rows_out INTEGER,
+                rows_per_sec REAL,
+                bytes_read INTEGER,
+                peak_rss_mb REAL
+            );
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_pipeline_span_log_execution_id ON pipeline_span_log (execution_id)")
+        
+        # Data Quality Table (rows checked and violations per rule, see data_quality.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS data_quality_log (
+                execution_id TEXT,
+                table_name TEXT,
+                rule TEXT,
+                column_name TEXT,
+                rows_checked INTEGER,
+                violations INTEGER,
+                logged_at TIMESTAMP
+            );
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_data_quality_log_execution_id ON data_quality_log (execution_id)")
+        
+        # Reconciliation Table (per-day sketch of the orders in each layer, see reconciliation.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS reconciliation_sketch (
+                layer TEXT,
+                table_name TEXT,
+                partition_date TEXT,
+                row_count INTEGER,
+                amount_sum REAL,
+                fingerprint TEXT,
+                last_batch_id TEXT,
+                updated_at TIMESTAMP,
+                PRIMARY KEY (layer, partition_date)
+            );
+        """)
+        
+        # Table Catalog (row count, columns, key/date ranges and size of each published table, see catalog.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS table_catalog (
+                database TEXT,
+                table_name TEXT,
+                row_count INTEGER,
+                columns TEXT,
+                key_column TEXT,
+                key_min TEXT,
+                key_max TEXT,
+                date_column TEXT,
+                date_min TEXT,
+                date_max TEXT,
+                size_bytes INTEGER,
+                last_batch_id TEXT,
+                updated_at TIMESTAMP,
+                PRIMARY KEY (database, table_name)
+            );
+        """)
+        
+        self._conn.commit()
+
+    def _execute(self, sql, params=()):
+        """Runs one write statement on the shared connection and commits it."""
+        with self._lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+    def _query(self, sql, params=()):
+        """Runs a read on the shared connection, after flushing buffered log writes."""
+        with self._lock:
+            self.flush()
+            return self._conn.execute(sql, params).fetchall()
+
+    def flush(self):
+        """Writes all buffered execution log statements in a single transaction."""
+        with self._lock:
+            if not self._pending_logs:
+                return
+            try:
+                for sql, params in self._pending_logs:
+                    self._conn.execute(sql, params)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            self._pending_logs.clear()
+
+    def close(self):
+        """Flushes buffered log writes and closes the connection."""
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self.flush()
+            finally:
+                self._conn.close()
+                self._conn = None
 
     def log_start(self, process_name, layer):
-        """Logs the start of a pipeline step."""
+        """Logs the start of a pipeline step, committing it (and anything buffered before it) at once."""
         execution_id = str(uuid.uuid4())
         start_time = datetime.now()
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO pipeline_execution_log 
-            (execution_id, batch_id, process_name, layer, status, start_time)
-            VALUES (?, ?, ?, ?, 'STARTED', ?)
-        """, (execution_id, self.batch_id, process_name, layer, start_time))
-        conn.commit()
-        conn.close()
+        with self._lock:
+            self._pending_logs.append(("""
+                INSERT INTO pipeline_execution_log
+                (execution_id, batch_id, process_name, layer, status, start_time)
+                VALUES (?, ?, ?, ?, 'STARTED', ?)
+            """, (execution_id, self.batch_id, process_name, layer, start_time)))
+            self.flush()
         
         return execution_id
 
     def log_end(self, execution_id, status='SUCCESS', rows_processed=0, error_message=None):
-        """Logs the completion (success or failure) of a pipeline step."""
+        """Logs the completion (success or failure) of a pipeline step and flushes the log buffer."""
         end_time = datetime.now()
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE pipeline_execution_log
-            SET status = ?, end_time = ?, rows_processed = ?, error_message = ?
-            WHERE execution_id = ?
-        """, (status, end_time, rows_processed, error_message, execution_id))
-        conn.commit()
-        conn.close()
+        with self._lock:
+            self._pending_logs.append(("""
+                UPDATE pipeline_execution_log
+                SET status = ?, end_time = ?, rows_processed = ?, error_message = ?
+                WHERE execution_id = ?
+            """, (status, end_time, rows_processed, error_message, execution_id)))
+            self.flush()
+
+    def record_span(self, execution_id, span):
+        """Logs a finished Span of a pipeline step (buffered until the step ends)."""
+        with self._lock:
+            self._pending_logs.append(("""
+                INSERT INTO pipeline_span_log
+                (span_id, execution_id, step, table_name, status, start_time, duration_seconds,
+                 rows_in, rows_out, rows_per_sec, bytes_read, peak_rss_mb)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (str(uuid.uuid4()), execution_id, span.step, span.table_name, span.status,
+                  span.start_time or datetime.now(), span.seconds, span.rows_in, span.rows_out,
+                  span.rows_per_sec, span.bytes_read, span.peak_rss_mb)))
+
+    def record_quality(self, execution_id, table_name, rows_checked, counts):
+        """Logs the violation count of each data quality rule checked on a table (buffered until the step ends).
+        
+        counts maps (rule, column) -> violating rows, as returned by data_quality.check_table.
+        """
+        logged_at = datetime.now()
+        with self._lock:
+            for (rule, column), violations in counts.items():
+                self._pending_logs.append(("""
+                    INSERT INTO data_quality_log
+                    (execution_id, table_name, rule, column_name, rows_checked, violations, logged_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (execution_id, table_name, rule, column, rows_checked, violations, logged_at)))
+
+    @contextmanager
+    def span(self, execution_id, step, table_name=None):
+        """Times the block as a Span of a pipeline step and logs it on exit, whether or not the block fails."""
+        span = Span(step, table_name)
+        try:
+            with span.timed():
+                yield span
+        finally:
+            self.record_span(execution_id, span)
 
     def get_watermark(self, process_name):
         """Retrieves the last successful timestamp for a process."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        # Initialize table if manual queries messed it up
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pipeline_watermark'")
-        if not cursor.fetchone():
-             return "1900-01-01 00:00:00"
-             
-        cursor.execute("SELECT last_processed_timestamp FROM pipeline_watermark WHERE process_name = ?", (process_name,))
-        result = cursor.fetchone()
-        conn.close()
-        
-        if result and result[0]:
-            return result[0]
+        result = self._query("SELECT last_processed_timestamp FROM pipeline_watermark WHERE process_name = ?", (process_name,))
+        
+        if result and result[0][0]:
+            return result[0][0]
         else:
             return "1900-01-01 00:00:00" # Default for initial load
 
     def update_watermark(self, process_name, timestamp, batch_id):
         """Updates the watermark for a process."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
+        self._execute("""
             INSERT OR REPLACE INTO pipeline_watermark (process_name, last_processed_timestamp, last_batch_id)
             VALUES (?, ?, ?)
         """, (process_name, timestamp, batch_id))
-        conn.commit()
-        conn.close()
+
+    def get_file_state(self, file_name):
+        """Retrieves the (file_size, file_mtime, checksum) last recorded for a source file, or None."""
+        result = self._query("SELECT file_size, file_mtime, checksum FROM source_file_state WHERE file_name = ?", (file_name,))
+        return result[0] if result else None
+
+    def update_file_state(self, file_name, file_size, file_mtime, checksum, batch_id):
+        """Records the size, modification time and checksum of a loaded source file."""
+        self._execute("""
+            INSERT OR REPLACE INTO source_file_state (file_name, file_size, file_mtime, checksum, last_batch_id)
+            VALUES (?, ?, ?, ?, ?)
+        """, (file_name, file_size, file_mtime, checksum, batch_id))
+
+    def replace_sketches(self, sketches, batch_id, days=None):
+        """Replaces the reconciliation sketches of the given days (all days if None) in one transaction.
+        
+        sketches is a DataFrame with a row per layer and day: layer, table_name and
+        reconciliation.SKETCH_COLUMNS. Days a layer no longer has rows on lose their sketch.
+        """
+        updated_at = datetime.now()
+        rows = [
+            (r.layer, r.table_name, r.partition_date, int(r.row_count), float(r.amount_sum),
+             r.fingerprint if isinstance(r.fingerprint, str) else None, batch_id, updated_at)
+            for r in sketches.itertuples(index=False)
+        ]
+        with self._lock:
+            self.flush()
+            try:
+                if days is None:
+                    self._conn.execute("DELETE FROM reconciliation_sketch")
+                else:
+                    self._conn.execute("DELETE FROM reconciliation_sketch WHERE partition_date IN (SELECT value FROM json_each(?))",
+                                       (json.dumps(list(days)),))
+                self._conn.executemany("""
+                    INSERT INTO reconciliation_sketch
+                    (layer, table_name, partition_date, row_count, amount_sum, fingerprint, last_batch_id, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, rows)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def update_catalog(self, database, entries, batch_id):
+        """Records the catalog entries (see catalog.describe_table) of tables a stage just published, in one transaction."""
+        updated_at = datetime.now()
+        rows = [
+            (database, e['table_name'], e['row_count'], e['columns'], e['key_column'], e['key_min'], e['key_max'],
+             e['date_column'], e['date_min'], e['date_max'], e['size_bytes'], batch_id, updated_at)
+            for e in entries
+        ]
+        with self._lock:
+            self.flush()
+            try:
+                self._conn.executemany("""
+                    INSERT OR REPLACE INTO table_catalog
+                    (database, table_name, row_count, columns, key_column, key_min, key_max,
+                     date_column, date_min, date_max, size_bytes, last_batch_id, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, rows)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def has_sketches(self):
+        """Checks whether any reconciliation sketch has been recorded yet."""
+        return bool(self._query("SELECT 1 FROM reconciliation_sketch LIMIT 1"))
+
+    def get_process_statuses(self):
+        """Returns process_name -> status of the latest run of each process logged for this batch."""
+        result = self._query("""
+            SELECT process_name, status FROM pipeline_execution_log
+            WHERE batch_id = ?
+            ORDER BY start_time
+        """, (self.batch_id,))
+        return dict(result)
+
+    def get_batches_since_last_success(self, process_name):
+        """Returns the batch_ids logged since the last successful run of a process, including the current batch.
+        
+        The batch that ran it is left out: its later rows (the sub-steps of the
+        process, the stages after it) changed nothing the process hasn't seen.
+        """
+        result = self._query("""
+            WITH last_success AS (
+                SELECT batch_id, start_time FROM pipeline_execution_log
+                WHERE process_name = ? AND status = 'SUCCESS'
+                ORDER BY start_time DESC LIMIT 1
+            )
+            SELECT DISTINCT batch_id FROM pipeline_execution_log
+            WHERE start_time > COALESCE((SELECT start_time FROM last_success), '')
+              AND batch_id IS NOT (SELECT batch_id FROM last_success)
+        """, (process_name,))
+        batch_ids = [row[0] for row in result]
+        
+        if self.batch_id not in batch_ids:
+            batch_ids.append(self.batch_id)
+        return batch_ids
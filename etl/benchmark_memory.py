@@ -0,0 +1,72 @@
+import argparse
+import multiprocessing
+import resource
+import time
+import pandas as pd
+import config
+from config import CURATED_DB_PATH
+
+WIDE_INPUTS = ["fact_orders", "fact_order_lines", "dim_products", "dim_customers", "fact_payments"]
+FACT_KEYS = {"fact_orders": ["order_id"], "fact_order_lines": ["order_id", "order_line_id"], "fact_payments": ["order_id", "payment_id"]}
+
+def _load_inputs(typed, scale):
+    """Reads the Curated inputs of reporting_sales_wide, either untyped (plain read_sql) or with schemas.SOURCE_DTYPES."""
+    import etl_pipeline
+    
+    conn = config.get_db_connection(CURATED_DB_PATH)
+    try:
+        frames = {}
+        for table in WIDE_INPUTS:
+            query = f"SELECT * FROM {table}"
+            frames[table] = etl_pipeline._read_frame(conn, table, query) if typed else pd.read_sql(query, conn)
+    finally:
+        conn.close()
+    if not typed:
+        frames["fact_orders"]["order_date"] = pd.to_datetime(frames["fact_orders"]["order_date"])
+    
+    # Scale the facts by copying them under new order IDs, so the join grows linearly
+    if scale > 1:
+        for table, keys in FACT_KEYS.items():
+            copies = []
+            for i in range(scale):
+                copy = frames[table].copy()
+                for key in keys:
+                    copy[key] = copy[key] + f"-{i}"
+                copies.append(copy)
+            frames[table] = pd.concat(copies, ignore_index=True)
+    return frames
+
+def _measure(typed, scale):
+    """Builds reporting_sales_wide once; returns (peak RSS growth MB, wide table MB, seconds, rows)."""
+    import etl_pipeline
+    
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    frames = _load_inputs(typed, scale)
+    wide = etl_pipeline._build_reporting_sales_wide(*(frames[t] for t in WIDE_INPUTS), "benchmark")
+    seconds = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux
+    return (rss_after - rss_before) / 1024, wide.memory_usage(deep=True).sum() / 1024 ** 2, seconds, len(wide)
+
+def run_benchmark(scale=1):
+    """Compares peak memory of the pandas wide-table build with untyped vs typed reads.
+    
+    Each variant runs in a fresh process so the peak RSS of one doesn't hide the other's.
+    """
+    print(f"--- Memory Benchmark: reporting_sales_wide (pandas engine, scale x{scale}) ---")
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for label, typed in [("object dtypes", False), ("typed (SOURCE_DTYPES)", True)]:
+        with ctx.Pool(1) as pool:
+            results[label] = pool.apply(_measure, (typed, scale))
+    
+    print(f"{'variant':<24}{'rows':>10}{'peak RSS +MB':>15}{'wide MB':>10}{'seconds':>10}")
+    for label, (peak_mb, wide_mb, seconds, rows) in results.items():
+        print(f"{label:<24}{rows:>10}{peak_mb:>15.1f}{wide_mb:>10.1f}{seconds:>10.2f}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Peak memory of the Gold wide join with and without typed reads")
+    parser.add_argument("--scale", type=int, default=1, help="Copies of the fact tables to join (default 1).")
+    run_benchmark(parser.parse_args().scale)
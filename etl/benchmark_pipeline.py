@@ -0,0 +1,290 @@
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import resource
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from config import BENCHMARK_DIR
+
+# Row counts of the bundled sources; a scale of N generates N times as many of each.
+BASE_ROWS = {'customers': 500, 'products': 100, 'orders': 1000}
+DEFAULT_SCALES = [10, 100, 1000]
+
+# Stages in pipeline order: (name, etl_pipeline function, process_name in pipeline_execution_log)
+STAGES = [
+    ('extract', 'extract_to_raw', 'Extract_Source_to_Raw'),
+    ('validate', 'validate_raw', 'Validate_Raw'),
+    ('dimensions', 'load_dimensions', 'Load_Dimensions'),
+    ('facts', 'load_facts', 'Load_Facts'),
+    ('gold', 'aggregate_to_gold', 'Aggregate_Gold'),
+    ('reconcile', 'reconcile_layers', 'Reconcile_Layers'),
+]
+
+# A stage regresses when it is this much slower or larger than the baseline...
+DEFAULT_THRESHOLD = 0.20
+# ...unless it took less than this many seconds in the baseline (too short to time reliably).
+MIN_SECONDS = 0.1
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+               'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+              'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin']
+CITY_PREFIXES = ['North', 'South', 'East', 'West', 'New', 'Port', 'Lake', 'Fort']
+STATES = ['AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'DC', 'FL', 'GA', 'HI', 'ID', 'IL', 'IN', 'IA', 'KS',
+          'KY', 'LA', 'ME', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC',
+          'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY']
+SEGMENTS = ['Retail', 'SME', 'Corporate']
+PRODUCT_TYPES = [
+    ('Electronics', 'Audio', 'SonicBeat'), ('Electronics', 'Accessories', 'ConnectPro'),
+    ('Electronics', 'Storage', 'SpeedDrive'), ('Electronics', 'Video', 'ViewMax'),
+    ('Furniture', 'Desks', 'FlexiDesk'), ('Furniture', 'Seating', 'FlexiDesk'),
+    ('Office Supplies', 'Writing', 'LogiTech'), ('Office Supplies', 'Accessories', 'KeyMaster'),
+]
+PRODUCT_WORDS = ['Land', 'Must', 'Blood', 'Knowledge', 'Field', 'Signal', 'Stone', 'River', 'Point', 'Light']
+CHANNELS = ['MOBILE', 'STORE', 'WEB']
+ORDER_STATUSES = ['PLACED', 'SHIPPED', 'DELIVERED', 'CANCELLED']
+PAYMENT_METHODS = ['CARD', 'UPI', 'CASH', 'PAYPAL']
+PAYMENT_STATUSES = ['SUCCESS', 'PENDING', 'FAILED']
+ORDER_DAYS = 60
+FIRST_ORDER_DATE = pd.Timestamp('2025-10-07')
+
+def _ids(prefix, count, width):
+    return pd.Series(np.arange(1, count + 1)).astype(str).str.zfill(width).radd(prefix)
+
+def _pick(rng, values, count):
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), count)]
+
+def generate_sources(sources_dir, scale, seed=42):
+    """Writes deterministic synthetic CSVs with the bundled source schemas at scale x the bundled row counts.
+    
+    The same scale and seed always give byte-identical files. Every order has 1-5
+    lines and one payment, and all foreign keys resolve, so each stage does the
+    same kind of work as on the real sources. Returns a dict of file name -> rows.
+    """
+    rng = np.random.default_rng(seed)
+    sources_dir = Path(sources_dir)
+    sources_dir.mkdir(parents=True, exist_ok=True)
+    n_customers, n_products, n_orders = (BASE_ROWS[t] * scale for t in ('customers', 'products', 'orders'))
+    width = len(str(n_orders * 5))
+    
+    first = _pick(rng, FIRST_NAMES, n_customers)
+    last = _pick(rng, LAST_NAMES, n_customers)
+    customer_ids = _ids("CUST", n_customers, width)
+    customers = pd.DataFrame({
+        'customer_id': customer_ids,
+        'first_name': first,
+        'last_name': last,
+        'email': pd.Series(first).str.lower() + "." + pd.Series(last).str.lower() + customer_ids.str[4:] + "@example.com",
+        'phone': pd.Series(rng.integers(200, 1000, n_customers)).astype(str) + "-555-"
+                 + pd.Series(rng.integers(0, 10000, n_customers)).astype(str).str.zfill(4),
+        'city': pd.Series(_pick(rng, CITY_PREFIXES, n_customers)) + " " + pd.Series(_pick(rng, LAST_NAMES, n_customers)),
+        'state': _pick(rng, STATES, n_customers),
+        'country': 'USA',
+        'segment': _pick(rng, SEGMENTS, n_customers),
+    })
+    
+    product_types = rng.integers(0, len(PRODUCT_TYPES), n_products)
+    products = pd.DataFrame({
+        'product_id': _ids("PROD", n_products, width),
+        'product_name': pd.Series(_pick(rng, PRODUCT_WORDS, n_products)) + " " + pd.Series(_pick(rng, PRODUCT_WORDS, n_products)),
+        'category': [PRODUCT_TYPES[t][0] for t in product_types],
+        'sub_category': [PRODUCT_TYPES[t][1] for t in product_types],
+        'brand': [PRODUCT_TYPES[t][2] for t in product_types],
+        'unit_price': rng.uniform(20, 500, n_products).round(2),
+        'status': 'Active',
+    })
+    
+    order_ids = _ids("ORD", n_orders, width)
+    order_dates = (FIRST_ORDER_DATE + pd.to_timedelta(rng.integers(0, ORDER_DAYS, n_orders), unit="D")).strftime("%Y-%m-%d")
+    lines_per_order = rng.integers(1, 6, n_orders)
+    n_lines = int(lines_per_order.sum())
+    line_orders = np.repeat(np.arange(n_orders), lines_per_order)
+    line_products = rng.integers(0, n_products, n_lines)
+    quantity = rng.integers(1, 4, n_lines)
+    discount = rng.uniform(0, 10, n_lines).round(2)
+    unit_price = products['unit_price'].to_numpy()[line_products]
+    line_totals = np.bincount(line_orders, weights=quantity * unit_price - discount, minlength=n_orders).round(2)
+    
+    orders = pd.DataFrame({
+        'order_id': order_ids,
+        'customer_id': customer_ids.to_numpy()[rng.integers(0, n_customers, n_orders)],
+        'order_date': order_dates,
+        'channel': _pick(rng, CHANNELS, n_orders),
+        'total_amount': line_totals,
+        'status': _pick(rng, ORDER_STATUSES, n_orders),
+    })
+    order_lines = pd.DataFrame({
+        'order_line_id': _ids("OL", n_lines, width),
+        'order_id': order_ids.to_numpy()[line_orders],
+        'product_id': products['product_id'].to_numpy()[line_products],
+        'quantity': quantity,
+        'unit_price': unit_price,
+        'discount_amount': discount,
+    })
+    payments = pd.DataFrame({
+        'payment_id': _ids("PAY", n_orders, width),
+        'order_id': order_ids,
+        'payment_date': order_dates,
+        'payment_method': _pick(rng, PAYMENT_METHODS, n_orders),
+        'payment_status': _pick(rng, PAYMENT_STATUSES, n_orders),
+        'payment_amount': line_totals,
+    })
+    
+    row_counts = {}
+    for name, df in [('customers', customers), ('products', products), ('orders', orders),
+                     ('order_lines', order_lines), ('payments', payments)]:
+        df.to_csv(sources_dir / f"{name}.csv", index=False)
+        row_counts[f"{name}.csv"] = len(df)
+    return row_counts
+
+def _peak_rss_mb():
+    """Peak RSS of this process in MB since the last _reset_peak_rss()."""
+    try:
+        with open("/proc/self/status") as f:
+            return int(re.search(r"VmHWM:\s+(\d+) kB", f.read()).group(1)) / 1024
+    except (OSError, AttributeError):
+        # No per-stage reset outside Linux: the peak so far (ru_maxrss is KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+def _reset_peak_rss():
+    """Resets the kernel's peak RSS counter (Linux); elsewhere peaks are cumulative."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def _run_stages():
+    """Runs the pipeline stages one after another on a fresh Target; returns per-stage measurements.
+    
+    Runs in a child process started with ETL_DATA_DIR pointing at the synthetic data.
+    """
+    import config
+    import etl_pipeline
+    from audit_manager import AuditManager
+    from dimension_cache import DimensionCache
+    
+    shutil.rmtree(config.TARGET_DIR, ignore_errors=True)
+    audit = AuditManager()
+    cache = DimensionCache()
+    results = {}
+    try:
+        for stage, func_name, process_name in STAGES:
+            kwargs = {'cache': cache} if stage in ('dimensions', 'gold') else {}
+            _reset_peak_rss()
+            started = time.perf_counter()
+            getattr(etl_pipeline, func_name)(audit, audit.batch_id, mode="full", **kwargs)
+            seconds = time.perf_counter() - started
+            rows = audit._query(
+                "SELECT SUM(rows_processed) FROM pipeline_execution_log WHERE batch_id = ? AND process_name = ?",
+                (audit.batch_id, process_name))[0][0] or 0
+            results[stage] = {
+                'seconds': round(seconds, 4),
+                'rows': rows,
+                'rows_per_sec': round(rows / seconds, 1) if seconds > 0 else None,
+                'peak_rss_mb': round(_peak_rss_mb(), 1),
+            }
+    finally:
+        audit.close()
+        config.close_all_connections()
+    return results
+
+def run_benchmark(scales, seed=42):
+    """Generates (or reuses) the synthetic data for each scale and times every stage on it.
+    
+    Each scale runs in a fresh process, so one scale's memory doesn't carry over
+    into the next. Returns the results document written by save_results.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    results = {'created': datetime.now().isoformat(timespec="seconds"), 'seed': seed, 'scales': {}}
+    for scale in scales:
+        data_dir = BENCHMARK_DIR / f"scale_{scale}_seed_{seed}"
+        sources_dir = data_dir / "Sources/Structured/source_structured_data"
+        if not (sources_dir / "payments.csv").exists():
+            print(f"Generating synthetic sources at x{scale} in {sources_dir} ...")
+            generate_sources(sources_dir, scale, seed)
+        
+        print(f"--- Pipeline Benchmark: x{scale} ---")
+        # The child inherits the environment, so its config resolves every path under data_dir
+        os.environ["ETL_DATA_DIR"] = str(data_dir)
+        try:
+            # Not a multiprocessing.Pool: its daemonic workers could not start the
+            # load_facts partition workers (config.FACT_PARTITIONS)
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                stages = pool.submit(_run_stages).result()
+        finally:
+            del os.environ["ETL_DATA_DIR"]
+        results['scales'][str(scale)] = stages
+        
+        print(f"{'stage':<12}{'rows':>12}{'seconds':>10}{'rows/s':>14}{'peak RSS MB':>13}")
+        for stage, m in stages.items():
+            rate = f"{m['rows_per_sec']:,.0f}" if m['rows_per_sec'] is not None else "-"
+            print(f"{stage:<12}{m['rows']:>12}{m['seconds']:>10.2f}{rate:>14}{m['peak_rss_mb']:>13.1f}")
+    return results
+
+def save_results(results, path=None):
+    """Writes benchmark results as JSON (default BENCHMARK_DIR/results/pipeline-<timestamp>.json)."""
+    path = Path(path) if path else BENCHMARK_DIR / "results" / f"pipeline-{datetime.now():%Y%m%d-%H%M%S}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2))
+    return path
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Lists the stages of current that are slower (or use more memory) than in baseline by more than threshold.
+    
+    Only scales and stages present in both runs are compared. Returns a list of
+    (scale, stage, metric, baseline value, current value).
+    """
+    regressions = []
+    for scale, stages in current['scales'].items():
+        for stage, m in stages.items():
+            base = baseline['scales'].get(scale, {}).get(stage)
+            if not base:
+                continue
+            if base['seconds'] >= MIN_SECONDS and m['seconds'] > base['seconds'] * (1 + threshold):
+                regressions.append((scale, stage, 'seconds', base['seconds'], m['seconds']))
+            if m['peak_rss_mb'] > base['peak_rss_mb'] * (1 + threshold):
+                regressions.append((scale, stage, 'peak_rss_mb', base['peak_rss_mb'], m['peak_rss_mb']))
+    return regressions
+
+def report_regressions(regressions, threshold=DEFAULT_THRESHOLD):
+    if not regressions:
+        print(f"No regressions (threshold {threshold:.0%}).")
+        return
+    print(f"REGRESSIONS (threshold {threshold:.0%}):")
+    for scale, stage, metric, before, after in regressions:
+        print(f"   x{scale} {stage:<12}{metric:<13}{before:>10} -> {after:<10} ({after / before - 1:+.0%})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage time, throughput and peak memory of the pipeline on synthetic data")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="Multiples of the bundled source sizes to run (default: 10 100 1000).")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the synthetic data generator (default 42).")
+    parser.add_argument("--output", help="Results file (default: BENCHMARK_DIR/results/pipeline-<timestamp>.json).")
+    parser.add_argument("--baseline", help="Results file of an earlier run to compare this run against.")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="Only compare two existing results files.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative slowdown or memory growth flagged as a regression (default 0.20).")
+    args = parser.parse_args()
+    
+    if args.compare:
+        baseline, current = (json.loads(Path(p).read_text()) for p in args.compare)
+    else:
+        current = run_benchmark(args.scales, args.seed)
+        print(f"Results written to {save_results(current, args.output)}")
+        baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    
+    if baseline is not None:
+        regressions = compare_results(baseline, current, args.threshold)
+        report_regressions(regressions, args.threshold)
+        sys.exit(1 if regressions else 0)
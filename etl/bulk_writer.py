@@ -0,0 +1,228 @@
+import json
+import time
+import datetime as dt
+import numpy as np
+import pandas as pd
+import config
+import schemas
+
+def _sqlite_type(dtype):
+    """Infers a SQLite column type for a pandas dtype (columns without a declared type)."""
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'TIMESTAMP'
+    return 'TEXT'
+
+def table_columns(table_name, df):
+    """Returns (column, type) pairs for writing df to table_name.
+    
+    Types come from the table's definition in schemas.py; columns it doesn't
+    declare (e.g. an unexpected extra column in a Raw file) fall back to the
+    type inferred from their dtype, so nothing is silently dropped.
+    """
+    spec = schemas.table_spec(table_name)
+    declared = dict(spec['columns']) if spec else {}
+    return [(col, declared.get(col) or _sqlite_type(df[col].dtype)) for col in df.columns]
+
+def create_table(conn, table_name, columns, replace=True):
+    """Creates table_name with the given (column, type) pairs, dropping it first if replace is set."""
+    if replace:
+        conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+    conn.execute(schemas.create_table_sql(table_name, columns))
+
+def create_indexes(conn, table_name):
+    """Builds the indexes declared for table_name in schemas.py, then runs ANALYZE on it.
+    
+    Indexes on columns the table doesn't have are skipped. Existing indexes are kept
+    (IF NOT EXISTS), so this is cheap to call after every load; ANALYZE refreshes the
+    statistics the query planner uses to pick them (bounded by PRAGMA analysis_limit).
+    """
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')}
+    for _, columns, sql in schemas.index_sql(table_name):
+        if set(columns) <= existing:
+            conn.execute(sql)
+    conn.execute(f'ANALYZE "{table_name}"')
+
+def publish_staged(conn, table_names, delete_keys=None, append=()):
+    """Swaps the staging tables of table_names into place in a single transaction.
+    
+    Readers see every table change at once, or (if anything fails) none of them.
+    By default a table is replaced by renaming its staging table over it. Tables in
+    append get the staging table's rows added instead. delete_keys maps tables to
+    (key column, keys): the table's rows with those keys are deleted and the staging
+    table's rows appended in their place.
+    Either way the table's indexes are (re)built and the staging table is gone.
+    """
+    delete_keys = delete_keys or {}
+    conn.execute("BEGIN")
+    try:
+        for table_name in table_names:
+            staging = schemas.staging_table(table_name)
+            if table_name in delete_keys:
+                key_column, keys = delete_keys[table_name]
+                conn.execute(f'DELETE FROM "{table_name}" WHERE "{key_column}" IN (SELECT value FROM json_each(?))',
+                             (json.dumps(sorted(keys)),))
+            if table_name in delete_keys or table_name in append:
+                column_list = ", ".join(f'"{row[1]}"' for row in conn.execute(f'PRAGMA table_info("{staging}")'))
+                conn.execute(f'INSERT INTO "{table_name}" ({column_list}) SELECT {column_list} FROM "{staging}"')
+                conn.execute(f'DROP TABLE "{staging}"')
+            else:
+                conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+                conn.execute(f'ALTER TABLE "{staging}" RENAME TO "{table_name}"')
+            create_indexes(conn, table_name)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def import_staged(conn, staged_paths):
+    """Copies staging tables built in other database files into conn's database, in one transaction.
+    
+    staged_paths maps table names to the file holding their staging table. The files
+    are attached together (SQLite can't detach inside a transaction; it attaches at
+    most 10) and each staging table is recreated with the same declared columns and
+    filled in conn's database, ready for publish_staged.
+    """
+    aliases = {table_name: f"staged_{i}" for i, table_name in enumerate(staged_paths)}
+    try:
+        for table_name, alias in aliases.items():
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (str(staged_paths[table_name]),))
+        conn.execute("BEGIN")
+        try:
+            for table_name, alias in aliases.items():
+                staging = schemas.staging_table(table_name)
+                create_sql = conn.execute(f"SELECT sql FROM {alias}.sqlite_master WHERE type = 'table' AND name = ?",
+                                          (staging,)).fetchone()[0]
+                conn.execute(f'DROP TABLE IF EXISTS main."{staging}"')
+                conn.execute(create_sql)
+                conn.execute(f'INSERT INTO main."{staging}" SELECT * FROM {alias}."{staging}"')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        for alias in aliases.values():
+            if any(row[1] == alias for row in conn.execute("PRAGMA database_list")):
+                conn.execute(f"DETACH DATABASE {alias}")
+
+def drop_staging(conn, table_names):
+    """Drops whatever staging tables of table_names are left, e.g. after a failed build."""
+    for table_name in table_names:
+        conn.execute(f'DROP TABLE IF EXISTS "{schemas.staging_table(table_name)}"')
+    conn.commit()
+
+def _format_timestamps(series, date_only=False):
+    """Formats a datetime column as text, one formatting per distinct value.
+    
+    Produces exactly what sqlite3's datetime adapter (datetime.isoformat(' ')) gives
+    per row: 'YYYY-MM-DD HH:MM:SS', with '.ffffff' only when there are microseconds.
+    With date_only, just 'YYYY-MM-DD' (for DATE columns). Stamps and dates repeat
+    heavily, so the column is factorized and only its distinct values are formatted.
+    """
+    if len(series) == 0:
+        return np.empty(0, dtype=object)
+    values = series.dt.tz_localize(None) if series.dt.tz is not None else series
+    codes, uniques = pd.factorize(values.to_numpy(dtype='datetime64[us]'))
+    if date_only:
+        text = np.datetime_as_string(uniques, unit='D').astype(object)
+    else:
+        text = _iso_text(uniques, 's')
+        has_micros = uniques.astype('int64') % 1_000_000 != 0
+        if has_micros.any():
+            text[has_micros] = _iso_text(uniques[has_micros], 'us')
+    # NaT has code -1, which picks the None appended after the distinct values
+    return np.append(text, None).take(codes)
+
+def _iso_text(values, unit):
+    """Formats datetime64 values as 'YYYY-MM-DD HH:MM:SS[.ffffff]' (an object array of str)."""
+    text = np.datetime_as_string(values, unit=unit)
+    if text.dtype.itemsize // 4 in (19, 26):
+        # Four-digit years: the 'T' is always the 11th character, overwritten in place
+        text.view('U1').reshape(len(text), -1)[:, 10] = ' '
+    else:
+        text = np.char.replace(text, 'T', ' ')
+    return text.astype(object)
+
+def _column_values(series, date_only=False):
+    """Converts one column to a numpy object array of values sqlite3 can bind."""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return _format_timestamps(series, date_only)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Missing values have code -1, which picks the None appended after the categories
+        categories = _column_values(pd.Series(series.cat.categories), date_only)
+        return np.append(categories, None).take(series.cat.codes.to_numpy())
+    missing = pd.isna(series).to_numpy()
+    if pd.api.types.is_numeric_dtype(series.dtype) and not missing.any():
+        # tolist() turns numpy scalars into Python int/float in one C pass
+        values = np.empty(len(series), dtype=object)
+        values[:] = series.to_numpy().tolist()
+    else:
+        values = series.to_numpy(dtype=object)
+        first = next((v for v in values[~missing][:1]), None)
+        if isinstance(first, dt.date) and not isinstance(first, dt.datetime):
+            values = np.array([v.isoformat() if v is not None and v == v else v for v in values], dtype=object)
+    if missing.any():
+        values[missing] = None
+    return values
+
+def frame_to_rows(df, columns=None, date_columns=()):
+    """Converts a DataFrame into a list of row tuples for executemany.
+    
+    Work is done column by column (one conversion per column, not per cell) and
+    the tuples are assembled with zip: timestamps become ISO text (just the date
+    for date_columns), categoricals their values, NaN/NaT/NA become None and numpy
+    scalars become Python int/float.
+    """
+    columns = list(df.columns) if columns is None else columns
+    return list(zip(*(_column_values(df[col], col in date_columns) for col in columns)))
+
+def date_typed_columns(columns):
+    """Returns the names of the DATE-typed columns among (column, type) pairs."""
+    return {name for name, col_type in columns if col_type == 'DATE'}
+
+def insert_rows(conn, table_name, columns, rows):
+    """Inserts rows with executemany in batches of config.BULK_INSERT_BATCH_SIZE, inside the caller's transaction."""
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    placeholders = ", ".join("?" for _ in columns)
+    sql = f'INSERT INTO "{table_name}" ({column_list}) VALUES ({placeholders})'
+    for start in range(0, len(rows), config.BULK_INSERT_BATCH_SIZE):
+        conn.executemany(sql, rows[start:start + config.BULK_INSERT_BATCH_SIZE])
+
+def report(table_name, rows, seconds):
+    """Prints the write throughput for a table (under its own name when it is a staging table)."""
+    rate = rows / seconds if seconds > 0 else float('inf')
+    print(f"     [write] {table_name.removesuffix(schemas.STAGING_SUFFIX)}: {rows} rows in {seconds:.3f}s ({rate:,.0f} rows/s)")
+
+def write_frames(conn, table_name, frames):
+    """Writes a sequence of DataFrames (chunks of one table) in a single transaction and reports rows/sec.
+    
+    The table is recreated from its typed schema, with the columns of the first
+    frame. frames can be a generator, so only one chunk needs to be in memory at a
+    time. Declared indexes are built after the rows are in, see create_indexes.
+    Returns the rows written.
+    """
+    started = time.perf_counter()
+    rows_written = 0
+    columns = None
+    
+    conn.execute("BEGIN")
+    try:
+        for df in frames:
+            if columns is None:
+                columns = table_columns(table_name, df)
+                create_table(conn, table_name, columns)
+            rows = frame_to_rows(df, [name for name, _ in columns], date_columns=date_typed_columns(columns))
+            insert_rows(conn, table_name, [name for name, _ in columns], rows)
+            rows_written += len(rows)
+        if columns is not None:
+            create_indexes(conn, table_name)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    report(table_name, rows_written, time.perf_counter() - started)
+    return rows_written
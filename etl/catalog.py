@@ -0,0 +1,109 @@
+import json
+import sqlite3
+import config
+import schemas
+
+# Per-table statistics the pipeline records in audit.db (table_catalog) whenever a stage
+# publishes a table, so the inspection tools can describe every table without reading it.
+# Only sqlite3 is needed here, so those tools start without importing pandas.
+CATALOG_COLUMNS = [
+    'database', 'table_name', 'row_count', 'columns', 'key_column', 'key_min', 'key_max',
+    'date_column', 'date_min', 'date_max', 'size_bytes', 'last_batch_id', 'updated_at'
+]
+
+# Date columns stamped by the pipeline itself, never a table's date column
+_STAMP_COLUMNS = {'ingestion_timestamp', 'transformation_timestamp', 'aggregation_timestamp'}
+
+def key_column(table_name):
+    """Returns the column that identifies a table's rows, or None if it has no declared one.
+    
+    That is the primary key of a Curated table, the key of the Curated table a Raw
+    (or quarantine) table is loaded into, or the first column of a Gold table's
+    first unique index (else of its first index).
+    """
+    table_name = table_name.removesuffix(schemas.QUARANTINE_SUFFIX)
+    spec = schemas.table_spec(table_name) or {}
+    if 'primary_key' in spec:
+        return spec['primary_key']
+    for curated in schemas.CURATED_TABLES.values():
+        if curated['source'] == table_name:
+            return curated['primary_key']
+    indexes = spec.get('unique_indexes', []) + spec.get('indexes', [])
+    return indexes[0][0] if indexes else None
+
+def date_column(table_name):
+    """Returns a table's first declared date or timestamp column (pipeline stamps aside), or None."""
+    table_name = table_name.removesuffix(schemas.QUARANTINE_SUFFIX)
+    if table_name in schemas.RAW_TABLES:
+        return next((c for c, kind in schemas.SOURCE_DTYPES.get(table_name, {}).items() if kind in ('datetime', 'date')), None)
+    spec = schemas.table_spec(table_name) or {}
+    return next((name for name, col_type in spec.get('columns', [])
+                 if col_type in ('DATE', 'TIMESTAMP') and name not in _STAMP_COLUMNS), None)
+
+def _size_bytes(conn, table_name):
+    """Returns the bytes of the pages holding a table and its indexes, or None without the dbstat table."""
+    try:
+        return conn.execute("""
+            SELECT SUM(pgsize) FROM dbstat
+            WHERE name = ? OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?)
+        """, (table_name, table_name)).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+def describe_table(conn, table_name):
+    """Computes a table's catalog entry (CATALOG_COLUMNS, less database, batch and time).
+    
+    Row count and the min/max of the key and date columns come from a single pass
+    over the table; columns is a JSON list of [column, declared type] pairs.
+    """
+    columns = [(row[1], row[2]) for row in conn.execute(f'PRAGMA table_info("{table_name}")')]
+    names = {name for name, _ in columns}
+    key, date = (column if column in names else None for column in (key_column(table_name), date_column(table_name)))
+    
+    aggregates = ["COUNT(*)"]
+    for column in (key, date):
+        aggregates += [f'MIN("{column}")', f'MAX("{column}")'] if column else ["NULL", "NULL"]
+    row_count, key_min, key_max, date_min, date_max = conn.execute(
+        f'SELECT {", ".join(aggregates)} FROM "{table_name}"').fetchone()
+    return {
+        'table_name': table_name,
+        'row_count': row_count,
+        'columns': json.dumps(columns),
+        'key_column': key,
+        'key_min': key_min,
+        'key_max': key_max,
+        'date_column': date,
+        'date_min': date_min,
+        'date_max': date_max,
+        'size_bytes': _size_bytes(conn, table_name),
+    }
+
+def read_catalog(database=None):
+    """Returns the catalog entries of a database ('Raw', 'Curated' or 'Gold'; all if None) as dicts of CATALOG_COLUMNS.
+    
+    Only audit.db is read. The list is empty if no entry has been recorded yet.
+    """
+    if not config.AUDIT_DB_PATH.exists():
+        return []
+    conn = config.get_db_connection(config.AUDIT_DB_PATH)
+    try:
+        cursor = conn.execute(f"""
+            SELECT {", ".join(CATALOG_COLUMNS)} FROM table_catalog
+            WHERE ? IS NULL OR database = ?
+            ORDER BY database, table_name
+        """, (database, database))
+        return [dict(zip(CATALOG_COLUMNS, row)) for row in cursor]
+    except sqlite3.Error:
+        return []
+    finally:
+        conn.close()
+
+def list_tables(db_path):
+    """Returns table name -> [(column, declared type)] for the tables in a database, from its schema alone (no table is read)."""
+    conn = config.acquire_connection(db_path)
+    try:
+        names = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+        return {name: [(row[1], row[2]) for row in conn.execute(f'PRAGMA table_info("{name}")')] for name in names}
+    finally:
+        config.release_connection(conn)
@@ -1,12 +1,15 @@
 import os
 import sqlite3
+import threading
 from pathlib import Path
 
 # Base directory
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # Data Directories
-DATA_DIR = BASE_DIR / "data"
+# ETL_DATA_DIR points the pipeline at another data root with the same layout
+# (e.g. a synthetic data set from benchmark_pipeline.py).
+DATA_DIR = Path(os.environ.get("ETL_DATA_DIR", BASE_DIR / "data"))
 SOURCES_DIR = DATA_DIR / "Sources/Structured/source_structured_data"
 TARGET_DIR = DATA_DIR / "Target"
 
@@ -20,8 +23,24 @@ SYSTEM_DIR = TARGET_DIR / "System"
 RAW_DB_PATH = RAW_DIR / "raw.db"
 CURATED_DB_PATH = CURATED_DIR / "curated.db"
 GOLD_DB_PATH = GOLD_DIR / "gold.db"
+# Each Gold table is built into its own database file here, so the builders running
+# in parallel don't take turns on gold.db's single writer; the pipeline copies them
+# into gold.db when publishing and then deletes them.
+GOLD_STAGING_DIR = GOLD_DIR / "staging"
 AUDIT_DB_PATH = SYSTEM_DIR / "audit.db"
 
+# Per-stage CPU profiles and allocation reports of `etl_pipeline.py --profile`,
+# one subdirectory per batch_id (see profiler.py).
+PROFILE_DIR = SYSTEM_DIR / "profiles"
+# Functions and allocation sites listed in each stage's profile report.
+PROFILE_TOP_N = 25
+
+# Synthetic data sets and results of benchmark_pipeline.py
+BENCHMARK_DIR = DATA_DIR / "Benchmarks"
+
+# Cached dimension frames, keyed by source file checksum (see dimension_cache.py)
+DIM_CACHE_DIR = SYSTEM_DIR / "dim_cache"
+
 # Standard System Columns
 SYS_COLS = {
     'BATCH_ID': 'batch_id',
@@ -30,9 +49,163 @@ SYS_COLS = {
     'PROCESS_NAME': 'process_name'
 }
 
+# Load Mode
+# 'incremental' appends only new data and skips unchanged source files;
+# 'full' reloads every source file from scratch.
+LOAD_MODE = 'incremental'
+
+# Rows read per chunk when streaming source CSVs into Raw.
+# Peak memory during extraction is bounded by this, not by file size.
+CSV_CHUNK_SIZE = 50000
+
+# Rows per executemany call in the bulk writer (Raw, Curated staging and Gold table loads).
+BULK_INSERT_BATCH_SIZE = 100000
+
+# Gold Execution Engine
+# 'sql' builds the Gold tables inside SQLite (curated.db attached to gold.db);
+# 'pandas' loads the Curated tables into DataFrames and joins/aggregates there.
+GOLD_ENGINE = 'sql'
+
+# Orders per chunk when the pandas engine builds reporting_sales_wide, so the
+# joined intermediate never holds the whole table.
+WIDE_CHUNK_ORDERS = 50000
+
+# Gold Storage Backend (see gold_store.py)
+# 'sqlite' serves the Gold tables from gold.db; 'parquet' also publishes them as
+# columnar Parquet files under GOLD_PARQUET_DIR (requires pyarrow) and readers such as
+# verify.py use those. gold.db stays the working copy the Gold builds update in both cases.
+GOLD_BACKEND = 'sqlite'
+GOLD_PARQUET_DIR = GOLD_DIR / "parquet"
+# Gold tables split into one Parquet partition per month of this date column.
+GOLD_PARQUET_PARTITIONS = {
+    'sales_summary_daily': 'order_date',
+    'reporting_sales_wide': 'order_date'
+}
+
+# Query results kept by the query tools' LRU cache (see query_layer.py).
+QUERY_CACHE_SIZE = 128
+
+# Seconds between RSS samples taken while a pipeline span is running (peak memory per span).
+SPAN_SAMPLE_INTERVAL = 0.05
+
+# How long a connection waits on a locked database before raising 'database is locked'.
+SQLITE_BUSY_TIMEOUT_MS = 30000
+
+# Worker threads used to run independent pipeline stages (and per-file loads) in parallel.
+# Set to 1 to run everything sequentially.
+MAX_WORKERS = 4
+
+# Partitions (by a hash of order_id) the fact tables are read and transformed in,
+# each on a worker process, with the results written to Curated from the main process.
+# 1 processes the fact tables whole, in the pipeline's own process. Worth raising
+# only for large loads: each worker pays the start-up of a new interpreter.
+FACT_PARTITIONS = 1
+
+# Process each pipeline stage is logged under in pipeline_execution_log, for
+# etl_pipeline.py --resume and the check of `etl_cli.py audit --check`.
+STAGE_PROCESSES = {
+    "extract": "Extract_Source_to_Raw",
+    "validate": "Validate_Raw",
+    "dimensions": "Load_Dimensions",
+    "facts": "Load_Facts",
+    "gold": "Aggregate_Gold",
+    "reconcile": "Reconcile_Layers",
+}
+
+# Source columns used as the high watermark for incremental extraction.
+# Files without an entry here are reloaded whole when their content changes.
+WATERMARK_COLUMNS = {
+    'orders': 'order_date',
+    'payments': 'payment_date'
+}
+
+# SQLite PRAGMAs applied to every connection opened through get_db_connection.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',          # readers don't block the writer (and vice versa)
+    'synchronous': 'NORMAL',        # safe with WAL; fsync at checkpoints instead of every commit
+    'cache_size': -65536,           # negative = KiB, i.e. a 64 MB page cache
+    'temp_store': 'MEMORY',         # sorts and temp tables stay in RAM
+    'mmap_size': 268435456,         # memory-map up to 256 MB of the database file
+    'busy_timeout': SQLITE_BUSY_TIMEOUT_MS,
+    'analysis_limit': 1000,         # ANALYZE samples ~1000 rows per index instead of scanning it
+}
+
+# Opt-in profile for initial/full loads (see use_bulk_load_profile): no fsync at all
+# and a bigger cache. A crash mid-load can corrupt the database, so only use it when
+# the load can simply be re-run from the sources.
+BULK_LOAD_PRAGMAS = {
+    'synchronous': 'OFF',
+    'cache_size': -262144,          # 256 MB
+}
+
+def _apply_pragmas(conn, pragmas):
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name}={value}")
+
 def get_db_connection(db_path):
     """Creates and returns a connection to the specified SQLite database."""
     # Ensure the directory exists
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    conn = sqlite3.connect(db_path)
+    # Pooled connections move between scheduler threads; only one thread uses a connection at a time
+    conn = sqlite3.connect(db_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    _apply_pragmas(conn, SQLITE_PRAGMAS)
+    if _bulk_load:
+        _apply_pragmas(conn, BULK_LOAD_PRAGMAS)
     return conn
+
+# --- Connection Manager ---
+# Pipeline stages check connections out of a per-database pool instead of opening
+# a new one each time. Used sequentially, that is one cached connection per zone
+# database for the life of the process; stages running in parallel get their own.
+_pool = {}
+_checked_out = {}
+_pool_guard = threading.Lock()
+_bulk_load = False
+
+def acquire_connection(db_path):
+    """Checks a cached connection to db_path out of the pool, opening one if none is idle."""
+    with _pool_guard:
+        idle = _pool.setdefault(str(db_path), [])
+        conn = idle.pop() if idle else None
+    if conn is None:
+        conn = get_db_connection(db_path)
+    with _pool_guard:
+        _checked_out[conn] = str(db_path)
+    return conn
+
+def release_connection(conn):
+    """Returns a connection to the pool. Any transaction left open is rolled back."""
+    if conn.in_transaction:
+        conn.rollback()
+    with _pool_guard:
+        _pool.setdefault(_checked_out.pop(conn), []).append(conn)
+
+def close_all_connections():
+    """Closes every idle pooled connection."""
+    with _pool_guard:
+        for idle in _pool.values():
+            for conn in idle:
+                conn.close()
+        _pool.clear()
+
+def use_bulk_load_profile(enabled=True):
+    """Switches pooled and new connections to (or back from) BULK_LOAD_PRAGMAS."""
+    global _bulk_load
+    with _pool_guard:
+        _bulk_load = enabled
+        pragmas = BULK_LOAD_PRAGMAS if enabled else {k: SQLITE_PRAGMAS[k] for k in BULK_LOAD_PRAGMAS}
+        for idle in _pool.values():
+            for conn in idle:
+                _apply_pragmas(conn, pragmas)
+
+_write_locks = {}
+_write_locks_guard = threading.Lock()
+
+def get_write_lock(db_path):
+    """Returns the process-wide lock that serialises write transactions on a database.
+    
+    SQLite allows a single writer per database file. Stages running in parallel take
+    this lock around each write transaction instead of failing with 'database is locked'.
+    """
+    with _write_locks_guard:
+        return _write_locks.setdefault(str(db_path), threading.RLock())
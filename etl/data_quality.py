@@ -0,0 +1,157 @@
+import json
+import numpy as np
+import pandas as pd
+import bulk_writer
+import schemas
+
+# Rules checked on the Raw rows each batch ingests, before the Curated loads read them.
+#   'not_null'   - columns that must have a value
+#   'unique'     - key column -> which duplicate is kept: the one the Curated load would
+#                  keep anyway ('first' for dimensions, deduplicated; 'last' for facts,
+#                  upserted), so quarantining the others doesn't change Curated. For
+#                  'first', keys earlier batches already loaded (rows appended to the
+#                  end of the file) are earlier duplicates, as in a full reload
+#   'references' - column -> (Raw table, column) it must match a row of
+#   'ranges'     - numeric column -> (min, max), None for an open end
+# Every table is also checked against its schemas.RAW_TABLES definition: missing
+# columns ('schema'), and values that don't parse as the declared number or date ('type').
+QUALITY_RULES = {
+    'customers': {
+        'not_null': ['customer_id'],
+        'unique': {'customer_id': 'first'},
+    },
+    'products': {
+        'not_null': ['product_id'],
+        'unique': {'product_id': 'first'},
+        'ranges': {'unit_price': (0, None)},
+    },
+    'orders': {
+        'not_null': ['order_id', 'customer_id', 'order_date'],
+        'unique': {'order_id': 'last'},
+        'references': {'customer_id': ('customers', 'customer_id')},
+        'ranges': {'total_amount': (0, None)},
+    },
+    'order_lines': {
+        'not_null': ['order_line_id', 'order_id', 'product_id'],
+        'unique': {'order_line_id': 'last'},
+        'references': {'order_id': ('orders', 'order_id'), 'product_id': ('products', 'product_id')},
+        'ranges': {'quantity': (1, None), 'unit_price': (0, None), 'discount_amount': (0, None)},
+    },
+    'payments': {
+        'not_null': ['payment_id', 'order_id'],
+        'unique': {'payment_id': 'last'},
+        'references': {'order_id': ('orders', 'order_id')},
+        'ranges': {'payment_amount': (0, None)},
+    },
+}
+
+# Referenced tables come first, so their quarantined rows are gone before they are referenced.
+VALIDATION_ORDER = ['customers', 'products', 'orders', 'order_lines', 'payments']
+
+def first_unique_columns(table_name):
+    """Returns the columns of a Raw table whose first occurrence is the one kept (see 'unique')."""
+    return [column for column, keep in QUALITY_RULES.get(table_name, {}).get('unique', {}).items() if keep == 'first']
+
+def references(table_name):
+    """Returns column -> (Raw table, column) for the references table_name's rows must match."""
+    return dict(QUALITY_RULES.get(table_name, {}).get('references', {}))
+
+def check_table(table_name, df, reference_keys=None, loaded_keys=None):
+    """Evaluates every rule of a Raw table on df with vectorised column operations.
+    
+    reference_keys maps each (Raw table, column) the table references to the valid
+    key values; loaded_keys maps each 'first' unique column to the keys earlier
+    batches already loaded into the Raw table. Each column is parsed at most once
+    and every rule is a boolean mask over all rows. Returns (counts, reasons):
+    counts maps (rule, column) -> number of violating rows, for every rule checked;
+    reasons holds, for the violating rows only (by position), the rules each one
+    broke, e.g. 'not_null(order_id), references(order_id)'.
+    """
+    rules = QUALITY_RULES.get(table_name, {})
+    declared = [(name, col_type) for name, col_type in schemas.RAW_TABLES[table_name]['columns']
+                if name not in schemas.SYSTEM_COLUMNS]
+    date_columns = {c for c, kind in schemas.SOURCE_DTYPES.get(table_name, {}).items() if kind in ('datetime', 'date')}
+    reference_keys = reference_keys or {}
+    loaded_keys = loaded_keys or {}
+    
+    masks = {}
+    parsed = {}
+    for column, col_type in declared:
+        if column not in df.columns:
+            masks[('schema', column)] = np.ones(len(df), dtype=bool)
+            continue
+        values = df[column]
+        if col_type in ('REAL', 'INTEGER'):
+            parsed[column] = pd.to_numeric(values, errors='coerce')
+        elif column in date_columns:
+            parsed[column] = pd.to_datetime(values, format='ISO8601', errors='coerce')
+        else:
+            continue
+        masks[('type', column)] = (parsed[column].isna() & values.notna()).to_numpy()
+    
+    for column in rules.get('not_null', []):
+        if column in df.columns:
+            masks[('not_null', column)] = df[column].isna().to_numpy()
+    for column, keep in rules.get('unique', {}).items():
+        if column in df.columns:
+            duplicated = df[column].duplicated(keep=keep)
+            if column in loaded_keys:
+                duplicated |= df[column].isin(loaded_keys[column])
+            masks[('unique', column)] = (duplicated & df[column].notna()).to_numpy()
+    for column, parent in rules.get('references', {}).items():
+        if column in df.columns and parent in reference_keys:
+            masks[('references', column)] = (~df[column].isin(reference_keys[parent]) & df[column].notna()).to_numpy()
+    for column, (low, high) in rules.get('ranges', {}).items():
+        if column in parsed:
+            values = parsed[column]
+            outside = np.zeros(len(df), dtype=bool)
+            if low is not None:
+                outside |= (values < low).to_numpy()
+            if high is not None:
+                outside |= (values > high).to_numpy()
+            masks[('ranges', column)] = outside
+    
+    counts = {}
+    reasons = np.full(len(df), "", dtype=object)
+    for (rule, column), mask in masks.items():
+        counts[(rule, column)] = int(mask.sum())
+        if counts[(rule, column)]:
+            reasons[mask] = reasons[mask] + f", {rule}({column})"
+    failed = reasons != ""
+    return counts, pd.Series(reasons[failed], index=np.flatnonzero(failed)).str.removeprefix(", ")
+
+def quarantine_rows(conn, table_name, df, reasons, rowid_column):
+    """Moves the violating rows of a Raw table into its quarantine table (see schemas.quarantine_table).
+    
+    df holds the checked rows with their Raw rowid in rowid_column, and reasons is
+    the Series returned by check_table. The quarantined rows keep their Raw columns
+    plus dq_violations. A source row quarantined again (its file was reloaded whole,
+    or its day read again) replaces the copy an earlier batch quarantined, so the
+    quarantine table holds each bad source row once. Runs inside the caller's
+    transaction. Returns the rows moved.
+    """
+    if reasons.empty:
+        return 0
+    rows = df.iloc[reasons.index]
+    quarantined = rows.drop(columns=[rowid_column]).assign(dq_violations=reasons.to_numpy())
+    quarantine = schemas.quarantine_table(table_name)
+    columns = bulk_writer.table_columns(table_name, quarantined)
+    bulk_writer.create_table(conn, quarantine, columns, replace=False)
+    
+    # Earlier copies of the same source rows are found through the table's key column
+    key = next(iter(QUALITY_RULES[table_name]['unique']))
+    batch_id = quarantined['batch_id'].iloc[0]
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{quarantine}_{key}" ON "{quarantine}" ("{key}")')
+    bulk_writer.insert_rows(conn, quarantine, list(quarantined.columns), bulk_writer.frame_to_rows(quarantined))
+    same_row = " AND ".join(f'new."{name}" IS old."{name}"' for name, _ in columns
+                            if name not in schemas.SYSTEM_COLUMNS and name != 'dq_violations')
+    conn.execute(f'''
+        DELETE FROM "{quarantine}" WHERE rowid IN (
+            SELECT old.rowid FROM "{quarantine}" old
+            JOIN "{quarantine}" new ON new.batch_id = ? AND {same_row}
+            WHERE old.batch_id IS NOT ? AND (old."{key}" IN (SELECT value FROM json_each(?)) OR old."{key}" IS NULL)
+        )
+    ''', (batch_id, batch_id, json.dumps(rows[key].dropna().unique().tolist() if key in rows else [])))
+    conn.execute(f'DELETE FROM "{table_name}" WHERE rowid IN (SELECT value FROM json_each(?))',
+                 (json.dumps(rows[rowid_column].tolist()),))
+    return len(rows)
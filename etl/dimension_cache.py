@@ -0,0 +1,55 @@
+import os
+import threading
+import pandas as pd
+from config import DIM_CACHE_DIR
+
+class DimensionCache:
+    """Typed, deduplicated dimension frames keyed by the checksum of their source file.
+    
+    A frame put in the cache stays in memory for the rest of the run (so the Gold
+    stage can join against it without reading SQLite) and is pickled to
+    DIM_CACHE_DIR, so the next run can reuse it as long as the source file has the
+    same checksum. Frames are shared between stages: treat them as read-only.
+    """
+    def __init__(self, cache_dir=DIM_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _path(self, table_name, checksum):
+        return self.cache_dir / f"{table_name}-{checksum}.pkl"
+
+    def get(self, table_name, checksum):
+        """Returns the cached frame for table_name if it was built from a source with this checksum, else None."""
+        if not checksum:
+            return None
+        with self._lock:
+            cached = self._frames.get(table_name)
+            if cached is not None and cached[0] == checksum:
+                return cached[1]
+            
+            path = self._path(table_name, checksum)
+            if not path.exists():
+                return None
+            try:
+                df = pd.read_pickle(path)
+            except Exception:
+                # An unreadable cache file is just a miss; the dimension gets rebuilt
+                return None
+            self._frames[table_name] = (checksum, df)
+            return df
+
+    def put(self, table_name, checksum, df):
+        """Caches df for table_name under the source checksum, replacing older versions on disk."""
+        if not checksum:
+            return
+        with self._lock:
+            self._frames[table_name] = (checksum, df)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(table_name, checksum)
+            staging_path = path.with_suffix(".tmp")
+            df.to_pickle(staging_path)
+            os.replace(staging_path, path)
+            for stale in self.cache_dir.glob(f"{table_name}-*.pkl"):
+                if stale != path:
+                    stale.unlink()
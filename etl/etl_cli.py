@@ -0,0 +1,152 @@
+"""One command line for the ETL tools: run, verify, inspect, query and audit.
+
+    python etl/etl_cli.py run [pipeline options]   # etl_pipeline.py
+    python etl/etl_cli.py verify [--backend] [--rescan]
+    python etl/etl_cli.py inspect [--zone ZONE] [--samples]
+    python etl/etl_cli.py query [--zone ZONE --sql SQL]
+    python etl/etl_cli.py audit [--batches N] [--failed] [--watermarks] [--spans] [--check]
+
+Only the stdlib, config and the sqlite3-only inspect_tables/catalog modules are
+imported up front; each subcommand imports the modules it needs when it runs.
+inspect (without --samples) and audit (without --spans) read metadata with
+sqlite3 alone and never import pandas, so cron jobs, health checks and shell
+scripts calling them start in a fraction of the time. run exits with status 1
+if the pipeline fails, as does audit --check if the latest batch didn't finish.
+"""
+import argparse
+import sys
+import config
+from inspect_tables import DB_PATHS
+
+RECENT_RUNS_SQL = """
+    WITH recent_batches AS (
+        SELECT batch_id, MIN(start_time) AS batch_start
+        FROM pipeline_execution_log
+        GROUP BY batch_id
+        ORDER BY batch_start DESC
+        LIMIT ?
+    )
+    SELECT substr(l.batch_id, 1, 8), l.process_name, l.layer, l.status, substr(l.start_time, 1, 19),
+           round((julianday(l.end_time) - julianday(l.start_time)) * 86400, 2), l.rows_processed, l.error_message
+    FROM pipeline_execution_log l
+    JOIN recent_batches b ON b.batch_id = l.batch_id
+    WHERE ? = 0 OR l.status = 'FAILED'
+    ORDER BY b.batch_start DESC, l.start_time
+"""
+RECENT_RUNS_COLUMNS = ["batch", "process", "layer", "status", "started", "seconds", "rows", "error"]
+
+# Steps of the latest batch in start order; a resumed step's last row is its current status
+LATEST_BATCH_STEPS_SQL = """
+    SELECT process_name, status FROM pipeline_execution_log
+    WHERE batch_id = (SELECT batch_id FROM pipeline_execution_log ORDER BY start_time DESC LIMIT 1)
+    ORDER BY start_time
+"""
+
+def _print_rows(columns, rows):
+    """Prints rows as a plain fixed-width table (no pandas)."""
+    cells = [["-" if value is None else str(value) for value in row] for row in rows]
+    widths = [max([len(column)] + [len(row[i]) for row in cells]) for i, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)).rstrip())
+    for row in cells:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+
+def _run(args, pipeline_args):
+    import etl_pipeline
+    return etl_pipeline.main(pipeline_args)
+
+def _verify(args):
+    import verify
+    verify.verify_data(args.backend, args.rescan)
+
+def _inspect(args):
+    import inspect_tables
+    for zone, path in DB_PATHS.items():
+        if args.zone in (None, zone):
+            inspect_tables.inspect_database(zone, path, args.samples)
+
+def _query(args):
+    if args.sql is None:
+        import query_tool
+        query_tool.main()
+        return
+    from query_layer import cache
+    print(cache.query(DB_PATHS[args.zone], args.sql).to_string(index=False))
+
+def _unfinished_steps(conn):
+    """Returns the steps of the latest batch that failed, are still STARTED or never ran (see config.STAGE_PROCESSES)."""
+    statuses = dict(conn.execute(LATEST_BATCH_STEPS_SQL).fetchall())
+    expected = list(config.STAGE_PROCESSES.values()) if statuses else []
+    steps = expected + [process for process in statuses if process not in expected]
+    return [f"{process} ({statuses.get(process, 'MISSING')})" for process in steps if statuses.get(process) != 'SUCCESS']
+
+def _audit(args):
+    """Prints the steps of the last batches from pipeline_execution_log; returns 1 if --check finds a step that didn't succeed."""
+    if not config.AUDIT_DB_PATH.exists():
+        print("No audit log yet. Run the pipeline first.")
+        return 1 if args.check else 0
+    if args.spans:
+        import span_report
+        span_report.print_report(args.batches)
+        return 0
+    conn = config.get_db_connection(config.AUDIT_DB_PATH)
+    try:
+        print(f"--- Pipeline Steps (last {args.batches} batches{', failed only' if args.failed else ''}) ---")
+        _print_rows(RECENT_RUNS_COLUMNS, conn.execute(RECENT_RUNS_SQL, (args.batches, int(args.failed))).fetchall())
+        if args.watermarks:
+            print("\n--- Watermarks ---")
+            cursor = conn.execute("""
+                SELECT process_name, substr(last_processed_timestamp, 1, 19), substr(last_batch_id, 1, 8)
+                FROM pipeline_watermark ORDER BY process_name
+            """)
+            _print_rows(["process", "last_processed", "batch"], cursor.fetchall())
+        unfinished = _unfinished_steps(conn)
+    finally:
+        conn.close()
+    if args.check and unfinished:
+        print(f"\nLatest batch has {len(unfinished)} failed or unfinished step(s): {', '.join(unfinished)}")
+        return 1
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="ETL pipeline tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    commands.add_parser("run", help="Run the pipeline; other options are passed to etl_pipeline.py (see run --help).",
+                        add_help=False)
+    
+    verify_parser = commands.add_parser("verify", help="Verify the Gold zone against Curated (verify.py).")
+    verify_parser.add_argument("--backend", choices=["sqlite", "parquet"],
+                               help="Gold storage backend to read (default: config.GOLD_BACKEND).")
+    verify_parser.add_argument("--rescan", action="store_true",
+                               help="Sketch every day from the tables instead of using the stored sketches.")
+    
+    inspect_parser = commands.add_parser("inspect", help="Describe each zone's tables from the table catalog (inspect_tables.py).")
+    inspect_parser.add_argument("--zone", choices=list(DB_PATHS), help="Only inspect this zone.")
+    inspect_parser.add_argument("--samples", action="store_true", help="Also read the first 3 rows of every table.")
+    
+    query_parser = commands.add_parser("query", help="Run a SELECT on a zone, or browse the zones interactively (query_tool.py).")
+    query_parser.add_argument("--zone", choices=list(DB_PATHS), default="GOLD", help="Database to query (default GOLD).")
+    query_parser.add_argument("--sql", help="SELECT to run; without it the interactive viewer starts.")
+    
+    audit_parser = commands.add_parser("audit", help="Show the pipeline steps of the last batches from the audit log.")
+    audit_parser.add_argument("--batches", type=int, default=3, help="Number of most recent batches to include (default 3).")
+    audit_parser.add_argument("--failed", action="store_true", help="Only show failed steps.")
+    audit_parser.add_argument("--watermarks", action="store_true", help="Also show the watermark of each process.")
+    audit_parser.add_argument("--spans", action="store_true", help="Show the slowest spans instead (span_report.py).")
+    audit_parser.add_argument("--check", action="store_true",
+                              help="Exit with status 1 if a step of the latest batch failed or didn't finish.")
+    return parser
+
+COMMANDS = {"verify": _verify, "inspect": _inspect, "query": _query, "audit": _audit}
+
+def main(argv=None):
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    if args.command == "run":
+        return _run(args, rest)
+    if rest:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    return COMMANDS[args.command](args)
+
+if __name__ == "__main__":
+    sys.exit(main())
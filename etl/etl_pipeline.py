@@ -1,256 +1,1336 @@
 import pandas as pd
+import argparse
+import hashlib
+import json
+import multiprocessing
 import os
 import sqlite3
+import sys
+import time
+import zlib
+import bulk_writer
+import catalog
 import config
-from datetime import datetime
+import data_quality
+import gold_sql
+import gold_store
+import reconciliation
+import schemas
+import wide_join
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from functools import partial
 from config import RAW_DB_PATH, CURATED_DB_PATH, GOLD_DB_PATH, SOURCES_DIR, SYS_COLS
 from audit_manager import AuditManager
+from dimension_cache import DimensionCache
+from profiler import StageProfiler
+from scheduler import Stage, run_stages
+from spans import Span, timed_chunks, untracked
 
-def extract_to_raw(audit, batch_id):
-    """Reads CSV files and loads them into the Raw database with system columns."""
+def _file_checksum(file_path, prefix_size=None):
+    """Returns (checksum, prefix checksum): the SHA-256 checksum of a file, read in 1 MB blocks.
+    
+    With prefix_size, the checksum of the file's first prefix_size bytes is taken in
+    the same pass; the prefix checksum is None without it, or if the file is shorter.
+    """
+    sha = hashlib.sha256()
+    prefix_checksum = None
+    bytes_read = 0
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            if prefix_size and prefix_checksum is None and bytes_read + len(block) >= prefix_size:
+                cut = prefix_size - bytes_read
+                sha.update(block[:cut])
+                prefix_checksum = sha.hexdigest()
+                sha.update(block[cut:])
+            else:
+                sha.update(block)
+            bytes_read += len(block)
+    return sha.hexdigest(), prefix_checksum
+
+def _appended_offset(file_path, state, prefix_checksum):
+    """Returns the byte offset the rows appended to a source file since its last load start at, or None.
+    
+    That is the size recorded at the last load (state), provided the file still
+    starts with exactly the content loaded then (prefix_checksum matches the recorded
+    checksum) and that content ended on a line break. Otherwise the file was
+    rewritten rather than appended to.
+    """
+    size, _, checksum = state
+    if not size or prefix_checksum != checksum:
+        return None
+    with open(file_path, "rb") as f:
+        f.seek(size - 1)
+        return size if f.read(1) == b"\n" else None
+
+def _read_csv_chunks(file_path, offset=None):
+    """Reads a CSV in chunks of config.CSV_CHUNK_SIZE rows, only from byte offset on if given (see _appended_offset)."""
+    if offset is None:
+        yield from pd.read_csv(file_path, chunksize=config.CSV_CHUNK_SIZE)
+        return
+    columns = list(pd.read_csv(file_path, nrows=0).columns)
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        try:
+            yield from pd.read_csv(f, header=None, names=columns, chunksize=config.CSV_CHUNK_SIZE)
+        except pd.errors.EmptyDataError:
+            return
+
+def _table_exists(conn, table_name):
+    """Checks whether a table exists in the given SQLite connection."""
+    cursor = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
+    return cursor.fetchone() is not None
+
+def _update_catalog(audit, batch_id, conn, database, table_names, trace=untracked):
+    """Records the catalog entries (see catalog.py) of the tables a stage just published, each as a 'catalog' span."""
+    entries = []
+    for table_name in table_names:
+        with trace("catalog", table_name) as span:
+            entries.append(catalog.describe_table(conn, table_name))
+            span.rows_out = entries[-1]['row_count']
+    audit.update_catalog(database, entries, batch_id)
+
+def _stream_csv_to_table(conn, file_path, table_name, batch_id, watermark_col=None, watermark=None, spans=None, offset=None):
+    """Streams a CSV into the staging table of a Raw table in chunks of config.CSV_CHUNK_SIZE rows.
+    
+    Each chunk is stamped with the system columns and inserted on its own, so
+    memory stays bounded by the chunk size rather than the file size. The Raw
+    table itself is untouched until extract_to_raw publishes the staging table
+    (or drops it, if a file fails). Chunks are parsed, stamped and converted to
+    rows without any lock; the Raw write lock is only held while a chunk is
+    inserted and committed, so files loaded in parallel parse while another writes.
+    With an offset only the rows appended from that byte on are read (see
+    _appended_offset). When a watermark is given, only rows with watermark_col on
+    or after it are kept.
+    The watermarks are whole days, so the rows of the last loaded day are read
+    again: late rows for that day still arrive, and the ones already loaded are
+    upserted unchanged into Curated.
+    spans optionally is a (read, transform, write) triple of spans.Span that the
+    parsing, filtering/stamping and inserting of the chunks are timed into.
+    
+    Returns (rows_written, max_watermark_value).
+    """
+    file_name = file_path.name
+    ingestion_ts = datetime.now()
+    started = time.perf_counter()
+    rows_written = 0
+    max_watermark = None
+    read_span, transform_span, write_span = spans or (Span("read"), Span("transform"), Span("write"))
+    staging = schemas.staging_table(table_name)
+    write_lock = config.get_write_lock(RAW_DB_PATH)
+    
+    for chunk in timed_chunks(_read_csv_chunks(file_path, offset), read_span):
+        rows_read = len(chunk)
+        with transform_span.timed():
+            if watermark_col:
+                # Unparseable dates are kept, but not counted in the watermark: validate_raw quarantines them
+                chunk_dates = pd.to_datetime(chunk[watermark_col], errors='coerce')
+                if watermark is not None:
+                    keep = chunk_dates.isna() | (chunk_dates >= watermark)
+                    chunk = chunk[keep]
+                    chunk_dates = chunk_dates[keep]
+                chunk_max = chunk_dates.max()
+                if pd.notna(chunk_max) and (max_watermark is None or chunk_max > max_watermark):
+                    max_watermark = chunk_max
+            
+            # --- System Columns ---
+            chunk[SYS_COLS['INGESTION_TS']] = ingestion_ts
+            chunk[SYS_COLS['BATCH_ID']] = batch_id
+            chunk[SYS_COLS['SOURCE_SYSTEM']] = 'CSV_Source'
+            chunk['source_filename'] = file_name
+        transform_span.add_rows(rows_read, len(chunk))
+        
+        with write_span.timed():
+            rows = bulk_writer.frame_to_rows(chunk)
+            with write_lock:
+                conn.execute("BEGIN")
+                try:
+                    if rows_written == 0:
+                        # Typed schema from schemas.RAW_TABLES
+                        conn.execute(f'DROP TABLE IF EXISTS "{staging}"')
+                        bulk_writer.create_table(conn, staging, bulk_writer.table_columns(table_name, chunk), replace=False)
+                    bulk_writer.insert_rows(conn, staging, list(chunk.columns), rows)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+        write_span.add_rows(len(chunk), len(chunk))
+        rows_written += len(chunk)
+    
+    bulk_writer.report(table_name, rows_written, time.perf_counter() - started)
+    return rows_written, max_watermark
+
+def _record_file_state(audit, batch_id, file_name, file_stat, checksum, watermark_name=None, max_watermark=None):
+    """Records a loaded file's state and the high watermark of its data (once its rows are published)."""
+    if max_watermark is not None:
+        audit.update_watermark(watermark_name, str(max_watermark), batch_id)
+    audit.update_file_state(file_name, file_stat.st_size, file_stat.st_mtime, checksum, batch_id)
+
+def _load_source_file(audit, batch_id, mode, process_name, execution_id, file_name):
+    """Loads one source CSV into the staging table of its Raw table.
+    
+    Returns None if the file was skipped, else (table_name, rows written, append,
+    record_state): append tells whether the rows are to be appended to the Raw
+    table rather than replace it, and record_state() records the file's state and
+    watermark, to be called once the rows are published.
+    The checksum, read, transform and write steps are logged as spans of execution_id.
+    """
+    file_path = SOURCES_DIR / file_name
+    if not file_path.exists():
+        print(f"Skipping missing file: {file_name}")
+        return None
+    
+    table_name = file_name.replace(".csv", "")
+    file_stat = file_path.stat()
+    
+    conn = config.acquire_connection(RAW_DB_PATH)
+    try:
+        # --- Change Detection ---
+        # A file is only appended to if it was loaded before and its Raw table still exists.
+        # Size and mtime are checked first so unchanged files are skipped without being hashed.
+        state = audit.get_file_state(file_name)
+        is_incremental = mode == "incremental" and state is not None and _table_exists(conn, table_name)
+        if is_incremental and state[:2] == (file_stat.st_size, file_stat.st_mtime):
+            print(f"  -> Skipped {table_name} (source unchanged)")
+            return None
+        
+        with audit.span(execution_id, "checksum", table_name) as span:
+            checksum, prefix_checksum = _file_checksum(file_path, state[0] if is_incremental else None)
+            span.bytes_read = file_stat.st_size
+        if is_incremental and state[2] == checksum:
+            audit.update_file_state(file_name, file_stat.st_size, file_stat.st_mtime, checksum, batch_id)
+            print(f"  -> Skipped {table_name} (source unchanged)")
+            return None
+        
+        # --- Delta Filter ---
+        # Rows appended to the end of a file are read on their own. Otherwise files with a
+        # watermark column append the rows on or after their watermark day; the rest are reloaded whole.
+        offset = _appended_offset(file_path, state, prefix_checksum) if is_incremental else None
+        watermark_col = config.WATERMARK_COLUMNS.get(table_name)
+        watermark_name = f"{process_name}.{table_name}"
+        append = is_incremental and (offset is not None or bool(watermark_col))
+        stored_watermark = audit.get_watermark(watermark_name) if append and watermark_col else None
+        watermark = pd.Timestamp(stored_watermark) if stored_watermark and offset is None else None
+        
+        spans = (Span("read", table_name), Span("transform", table_name), Span("write", table_name))
+        try:
+            file_rows, max_watermark = _stream_csv_to_table(
+                conn, file_path, table_name, batch_id, watermark_col, watermark, spans, offset
+            )
+            spans[0].bytes_read = file_stat.st_size - (offset or 0)
+        finally:
+            for span in spans:
+                audit.record_span(execution_id, span)
+        # Appended rows may all be older than the stored watermark, which must not move back
+        if max_watermark is not None and stored_watermark and max_watermark < pd.Timestamp(stored_watermark):
+            max_watermark = None
+        load = "appended rows" if offset is not None else "append" if append else "replace"
+        print(f"  -> Processed {file_rows} rows for {table_name} ({load})")
+    finally:
+        config.release_connection(conn)
+    
+    return table_name, file_rows, append, partial(_record_file_state, audit, batch_id, file_name, file_stat, checksum,
+                                                  watermark_name, max_watermark)
+
+def extract_to_raw(audit, batch_id, mode=config.LOAD_MODE):
+    """Reads CSV files and loads them into the Raw database with system columns.
+    
+    In 'incremental' mode, files whose size, mtime and checksum are unchanged since
+    the last run are skipped. When a file has only grown (its old content is still
+    there, unchanged), just the appended rows are read and appended. Other changed
+    files with a watermark column (see config.WATERMARK_COLUMNS) append the rows on
+    or after the stored watermark day; the rest are reloaded whole. 'full' mode
+    replaces every table.
+    Files are independent, so they are loaded in parallel (see scheduler.run_stages);
+    each is streamed in chunks into a staging table (see _stream_csv_to_table). Only
+    when every file is loaded are the staging tables published, in one transaction,
+    and the file states and watermarks recorded: a failed extract changes nothing.
+    The published tables' row counts, key/date ranges and sizes are then recorded
+    in the table catalog (see catalog.py), as every loading stage does.
+    """
     process_name = "Extract_Source_to_Raw"
     execution_id = audit.log_start(process_name, "Raw")
     total_rows = 0
     
-    conn = config.get_db_connection(RAW_DB_PATH)
     files_to_load = ["customers.csv", "order_lines.csv", "orders.csv", "payments.csv", "products.csv"]
     
+    raw_conn = config.acquire_connection(RAW_DB_PATH)
     try:
-        for file_name in files_to_load:
-            file_path = SOURCES_DIR / file_name
-            if not file_path.exists():
-                print(f"Skipping missing file: {file_name}")
-                continue
-            
-            df = pd.read_csv(file_path)
-            
-            # --- System Columns ---
-            df[SYS_COLS['INGESTION_TS']] = datetime.now()
-            df[SYS_COLS['BATCH_ID']] = batch_id
-            df[SYS_COLS['SOURCE_SYSTEM']] = 'CSV_Source'
-            df['source_filename'] = file_name
-            
-            table_name = file_name.replace(".csv", "")
-            df.to_sql(table_name, conn, if_exists="replace", index=False)
-            total_rows += len(df)
-            print(f"  -> Processed {len(df)} rows for {table_name}")
+        file_stages = [
+            Stage(file_name, partial(_load_source_file, audit, batch_id, mode, process_name, execution_id, file_name))
+            for file_name in files_to_load
+        ]
+        try:
+            loaded = [result for result in run_stages(file_stages).values() if result is not None]
             
+            # Files that produced no rows have nothing to publish
+            staged = [(table_name, append) for table_name, rows, append, _ in loaded if rows > 0]
+            with config.get_write_lock(RAW_DB_PATH), audit.span(execution_id, "publish", "raw.db"):
+                bulk_writer.publish_staged(raw_conn, [table_name for table_name, _ in staged],
+                                           append={table_name for table_name, append in staged if append})
+        except Exception:
+            with config.get_write_lock(RAW_DB_PATH):
+                bulk_writer.drop_staging(raw_conn, [file_name.replace(".csv", "") for file_name in files_to_load])
+            raise
+        _update_catalog(audit, batch_id, raw_conn, "Raw", [table_name for table_name, _ in staged],
+                        partial(audit.span, execution_id))
+        
+        for _, rows, _, record_state in loaded:
+            record_state()
+            total_rows += rows
+        
         # Update Watermark to NOW
         audit.update_watermark(process_name, datetime.now(), batch_id)
         
         audit.log_end(execution_id, status='SUCCESS', rows_processed=total_rows)
-        
+    
     except Exception as e:
         audit.log_end(execution_id, status='FAILED', error_message=str(e))
         print(f"Error in Extraction: {e}")
         raise e
     finally:
-        conn.close()
+        config.release_connection(raw_conn)
+
+def _reference_keys(raw_conn, curated_conn, table_name, column, values, mode):
+    """Returns which of values a reference to a Raw table's column may take (see data_quality.QUALITY_RULES).
+    
+    That is those of the values found in the Raw table's column plus, unless the
+    mode is 'full' (Curated is then rebuilt from Raw alone), those already loaded
+    into Curated. Only the values the batch references are looked up (by index),
+    so the cost follows the batch rather than the tables.
+    """
+    keys = set()
+    values = json.dumps(pd.Series(values).dropna().unique().tolist())
+    if _table_exists(raw_conn, table_name) and column in {row[1] for row in raw_conn.execute(f'PRAGMA table_info("{table_name}")')}:
+        keys.update(row[0] for row in raw_conn.execute(
+            f'SELECT DISTINCT "{column}" FROM "{table_name}" WHERE "{column}" IN (SELECT value FROM json_each(?))', (values,)))
+    curated_table = next((name for name, spec in schemas.CURATED_TABLES.items() if spec['source'] == table_name), None)
+    if mode != "full" and curated_table and _table_exists(curated_conn, curated_table):
+        keys.update(row[0] for row in curated_conn.execute(
+            f'SELECT DISTINCT "{column}" FROM "{curated_table}" WHERE "{column}" IN (SELECT value FROM json_each(?))', (values,)))
+    return keys
+
+def _loaded_keys(raw_conn, table_name, column, batch_id):
+    """Returns the values of a Raw table's column that earlier batches loaded, among those the batch brings."""
+    return {row[0] for row in raw_conn.execute(f"""
+        SELECT DISTINCT "{column}" FROM "{table_name}"
+        WHERE "{column}" IN (SELECT "{column}" FROM "{table_name}" WHERE batch_id = ?) AND batch_id != ?
+    """, (batch_id, batch_id))}
+
+def validate_raw(audit, batch_id, mode=config.LOAD_MODE):
+    """Checks the batch's Raw rows against the data quality rules and quarantines the rows that fail.
+    
+    Every rule in data_quality.QUALITY_RULES is evaluated on each table's new rows in
+    one vectorised pass (see data_quality.check_table). The violations per rule are
+    counted into data_quality_log in audit.db, and the failing rows are moved from
+    the Raw table to its quarantine table (in one transaction for all tables), so
+    the Curated loads never see them. Bad rows don't fail the batch.
+    Reads, checks and quarantine writes are logged as spans.
+    """
+    process_name = "Validate_Raw"
+    execution_id = audit.log_start(process_name, "Raw")
+    trace = partial(audit.span, execution_id)
+    rows_checked = 0
+    quarantined = {}
+    
+    raw_conn = config.acquire_connection(RAW_DB_PATH)
+    curated_conn = config.acquire_connection(CURATED_DB_PATH)
+    
+    try:
+        with config.get_write_lock(RAW_DB_PATH):
+            raw_conn.execute("BEGIN")
+            try:
+                for table_name in data_quality.VALIDATION_ORDER:
+                    if not _table_exists(raw_conn, table_name):
+                        continue
+                    with trace("read", table_name) as span:
+                        df = pd.read_sql(f'SELECT rowid AS _raw_rowid, * FROM "{table_name}" WHERE batch_id = ?',
+                                         raw_conn, params=(batch_id,))
+                        span.rows_out = len(df)
+                    with trace("validate", table_name) as span:
+                        # Referenced tables were validated first, so their quarantined rows are already gone
+                        reference_keys = {
+                            reference: _reference_keys(raw_conn, curated_conn, *reference,
+                                                       df[column] if column in df.columns else [], mode)
+                            for column, reference in data_quality.references(table_name).items()
+                        }
+                        loaded_keys = {column: _loaded_keys(raw_conn, table_name, column, batch_id)
+                                       for column in data_quality.first_unique_columns(table_name)}
+                        counts, reasons = data_quality.check_table(table_name, df, reference_keys, loaded_keys)
+                        span.rows_in, span.rows_out = len(df), len(df) - len(reasons)
+                    if len(reasons):
+                        with trace("write", schemas.quarantine_table(table_name)) as span:
+                            quarantined[table_name] = span.rows_out = data_quality.quarantine_rows(
+                                raw_conn, table_name, df, reasons, "_raw_rowid"
+                            )
+                    audit.record_quality(execution_id, table_name, len(df), counts)
+                    rows_checked += len(df)
+                raw_conn.commit()
+            except Exception:
+                raw_conn.rollback()
+                raise
+        _update_catalog(audit, batch_id, raw_conn, "Raw",
+                        [name for table_name in quarantined for name in (table_name, schemas.quarantine_table(table_name))],
+                        trace)
+        
+        audit.log_end(execution_id, status='SUCCESS', rows_processed=rows_checked)
+        if quarantined:
+            moved = ", ".join(f"{rows} {table_name}" for table_name, rows in quarantined.items())
+            print(f"  -> Validated {rows_checked} Raw rows; quarantined {moved} (see data_quality_log).")
+        else:
+            print(f"  -> Validated {rows_checked} Raw rows (all rules passed).")
+    
+    except Exception as e:
+        audit.log_end(execution_id, status='FAILED', error_message=str(e))
+        print(f"Error in Validation: {e}")
+        raise e
+    finally:
+        config.release_connection(raw_conn)
+        config.release_connection(curated_conn)
+
+def _needs_rebuild(conn, table_name):
+    """Checks whether a Curated table must be (re)created: it is missing, or has no primary key.
+    
+    Tables left over from the old replace-based loads have no primary key; they are
+    dropped and recreated when the stage publishes (see _merge_staged).
+    """
+    pk_columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")') if row[5]]
+    return not pk_columns
+
+def _read_frame(conn, table_name, query, params=(), trace=untracked):
+    """Runs a query against a source/Curated table and applies its schemas.SOURCE_DTYPES.
+    
+    Categoricals, downcast integers and parsed dates are set up once here, so the
+    transforms never see (or re-parse) the generic object columns.
+    trace (e.g. a stage's AuditManager.span) times the read as a 'read' span.
+    """
+    with trace("read", table_name) as span:
+        df = pd.read_sql(query, conn, params=params)
+        for col, kind in schemas.frame_dtypes(table_name).items():
+            if col not in df.columns:
+                continue
+            if kind == 'category':
+                df[col] = df[col].astype('category')
+            elif kind == 'integer':
+                df[col] = pd.to_numeric(df[col], downcast='integer')
+            else:
+                df[col] = pd.to_datetime(df[col], format='ISO8601')
+        span.rows_out = len(df)
+    return df
+
+def _read_raw_delta(raw_conn, curated_conn, raw_table, curated_table, batch_id, mode, trace=untracked):
+    """Reads the Raw rows to apply to a Curated table.
+    
+    Only rows ingested by the current batch are returned, unless the mode is 'full'
+    or the Curated table must be (re)created, in which case the whole Raw table is.
+    Returns (DataFrame, replace) where replace means the Curated table must be rebuilt.
+    """
+    if mode == "full" or _needs_rebuild(curated_conn, curated_table):
+        return _read_frame(raw_conn, raw_table, f"SELECT * FROM {raw_table}", trace=trace), True
+    return _read_frame(raw_conn, raw_table, f"SELECT * FROM {raw_table} WHERE batch_id = ?", (batch_id,), trace), False
+
+def _stage_rows(conn, table_name, df, trace=untracked):
+    """Writes the rows to merge into a Curated table to its staging table (see _publish_curated).
+    
+    Holds the Curated write lock, so dimension and fact loads can run in parallel.
+    Returns the number of rows staged. trace times the write as a 'write' span.
+    """
+    columns = [name for name, _ in schemas.CURATED_TABLES[table_name]['columns']]
+    with config.get_write_lock(CURATED_DB_PATH):
+        return _traced(trace, "write", table_name, partial(
+            bulk_writer.write_frames, conn, schemas.staging_table(table_name), [df.reindex(columns=columns)]
+        ), len(df))
+
+def _publish_curated(conn, staged, trace=untracked):
+    """Merges staged rows into their Curated tables in a single transaction.
+    
+    staged maps each table to whether it is to be replaced rather than merged
+    into (see _merge_staged). Either every table changes or none does. Returns a
+    dict of table -> rows inserted or changed; each merge is a 'publish' span.
+    """
+    changed_rows = {}
+    with config.get_write_lock(CURATED_DB_PATH):
+        conn.execute("BEGIN")
+        try:
+            conn.execute(schemas.CHANGE_LOG_SQL)
+            conn.execute(schemas.CHANGE_LOG_INDEX_SQL)
+            for table_name, replace in staged.items():
+                with trace("publish", table_name) as span:
+                    changed_rows[table_name] = _merge_staged(conn, table_name, replace)
+                    span.rows_out = changed_rows[table_name]
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return changed_rows
+
+def _merge_staged(conn, table_name, replace):
+    """Upserts a Curated table's staged rows into it by primary key (SCD Type 1), then drops the staging table.
+    
+    New keys are inserted; existing keys are overwritten only when a business
+    column actually changed, so unchanged rows keep their original batch_id. Of
+    several staged rows with the same key the last one wins. With replace=True the
+    table is recreated empty first and its secondary indexes are only built once
+    the rows are in, which is much cheaper than maintaining them row by row.
+    Runs inside the caller's transaction. Returns the number of rows inserted or updated.
+    """
+    spec = schemas.CURATED_TABLES[table_name]
+    key = spec['primary_key']
+    staging = schemas.staging_table(table_name)
+    columns = [name for name, _ in spec['columns']]
+    compared = [c for c in columns if c != key and c not in schemas.SYSTEM_COLUMNS]
+    
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    updates = ", ".join(f'"{c}" = excluded."{c}"' for c in columns if c != key)
+    changed = " OR ".join(f'"{table_name}"."{c}" IS NOT excluded."{c}"' for c in compared)
+    
+    if replace:
+        conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        conn.execute(schemas.create_table_sql(table_name))
+    else:
+        _log_prior_values(conn, table_name)
+    changes_before = conn.total_changes
+    # WHERE true keeps SQLite from reading ON CONFLICT as part of the SELECT
+    conn.execute(f"""
+        INSERT INTO "{table_name}" ({column_list})
+        SELECT {column_list} FROM "{staging}" WHERE true ORDER BY rowid
+        ON CONFLICT ("{key}") DO UPDATE SET {updates}
+        WHERE {changed}
+    """)
+    changed_rows = conn.total_changes - changes_before
+    bulk_writer.create_indexes(conn, table_name)
+    conn.execute(f'DROP TABLE "{staging}"')
+    return changed_rows
+
+def _log_prior_values(conn, table_name):
+    """Writes to change_log the current value of each tracked column the staged rows are about to overwrite."""
+    spec = schemas.CURATED_TABLES[table_name]
+    key = spec['primary_key']
+    staging = schemas.staging_table(table_name)
+    for column in spec.get('tracked_columns', []):
+        conn.execute(f"""
+            INSERT INTO change_log (batch_id, table_name, key_value, column_name, prior_value)
+            SELECT DISTINCT s."{SYS_COLS['BATCH_ID']}", ?, t."{key}", ?, t."{column}"
+            FROM "{staging}" s JOIN "{table_name}" t ON t."{key}" = s."{key}"
+            WHERE s."{column}" IS NOT t."{column}"
+        """, (table_name, column))
+
+def _source_checksum(audit, raw_table):
+    """Returns the checksum recorded for a table's source CSV at its last load, or None."""
+    state = audit.get_file_state(f"{raw_table}.csv")
+    return state[2] if state else None
+
+def _cached_dimension(audit, cache, table_name):
+    """Returns the cached frame of a dimension if it is current for its source file, else None."""
+    if cache is None:
+        return None
+    return cache.get(table_name, _source_checksum(audit, schemas.CURATED_TABLES[table_name]['source']))
+
+def _dimension_frame(audit, cache, curated_conn, table_name, where="", params=(), trace=untracked):
+    """Returns a dimension for the Gold joins: the cached frame when current, else read from Curated.
+    
+    where/params optionally narrow the Curated read; the cached frame is always the whole
+    dimension, which gives the same inner-join results.
+    """
+    cached = _cached_dimension(audit, cache, table_name)
+    if cached is not None:
+        return cached
+    return _read_frame(curated_conn, table_name, f"SELECT * FROM {table_name} {where}", params, trace)
+
+def _stage_dimension(raw_conn, curated_conn, table_name, batch_id, mode, system_columns, trace=untracked):
+    """Stages the batch's Raw rows of one dimension for merging. Returns (rows staged, replace)."""
+    spec = schemas.CURATED_TABLES[table_name]
+    df, replace = _read_raw_delta(raw_conn, curated_conn, spec['source'], table_name, batch_id, mode, trace)
+    with trace("transform", table_name) as span:
+        span.rows_in = len(df)
+        df = df.drop_duplicates(subset=[spec['primary_key']])
+        
+        # Add System Columns
+        for column, value in system_columns.items():
+            df[column] = value
+        df['transformation_timestamp'] = datetime.now()
+        span.rows_out = len(df)
+    
+    return _stage_rows(curated_conn, table_name, df, trace), replace
 
-def load_dimensions(audit, batch_id):
-    """Processes Customers and Products (Dimensions)."""
+def load_dimensions(audit, batch_id, mode=config.LOAD_MODE, cache=None):
+    """Processes Customers and Products (Dimensions).
+    
+    Dimensions are SCD Type 1: the batch's new customers/products are inserted and
+    changed attributes overwrite the existing row in place.
+    With a DimensionCache, a dimension whose source file is unchanged since it was
+    cached is skipped outright; a merged dimension is read back and cached for the
+    Gold stage and the next run.
+    The rows are staged first and merged into both dimensions in one transaction
+    (see _publish_curated). Reads, transforms, writes, merges and cache refreshes
+    are logged as spans.
+    """
     process_name = "Load_Dimensions"
     execution_id = audit.log_start(process_name, "Curated")
+    trace = partial(audit.span, execution_id)
     total_rows = 0
     
-    raw_conn = config.get_db_connection(RAW_DB_PATH)
-    curated_conn = config.get_db_connection(CURATED_DB_PATH)
+    raw_conn = config.acquire_connection(RAW_DB_PATH)
+    curated_conn = config.acquire_connection(CURATED_DB_PATH)
+    
+    dimensions = [
+        ("dim_customers", "Customers", {SYS_COLS['BATCH_ID']: batch_id, SYS_COLS['PROCESS_NAME']: process_name}),
+        ("dim_products", "Products", {SYS_COLS['BATCH_ID']: batch_id}),
+    ]
     
     try:
-        # --- Dim Customers ---
-        # In a real scenario, we would implement SCD logic here.
-        # For now, we clean and load standard columns.
-        customers = pd.read_sql("SELECT * FROM customers", raw_conn)
-        customers = customers.drop_duplicates(subset=['customer_id'])
-        
-        # Add System Columns
-        customers[SYS_COLS['BATCH_ID']] = batch_id
-        customers[SYS_COLS['Process_Name'.upper()]] = process_name # Using key from config if mapped, else manual
-        customers['transformation_timestamp'] = datetime.now()
-        
-        customers.to_sql("dim_customers", curated_conn, if_exists="replace", index=False)
-        total_rows += len(customers)
-        
-        # --- Dim Products ---
-        products = pd.read_sql("SELECT * FROM products", raw_conn)
-        products = products.drop_duplicates(subset=['product_id'])
-        
-        products[SYS_COLS['BATCH_ID']] = batch_id
-        products['transformation_timestamp'] = datetime.now()
+        staged = {}
+        rows_staged = {}
+        try:
+            for table_name, _, system_columns in dimensions:
+                if (mode != "full" and _table_exists(curated_conn, table_name)
+                        and _cached_dimension(audit, cache, table_name) is not None):
+                    continue
+                rows_staged[table_name], staged[table_name] = _stage_dimension(
+                    raw_conn, curated_conn, table_name, batch_id, mode, system_columns, trace
+                )
+            rows_changed = _publish_curated(curated_conn, staged, trace)
+        except Exception:
+            with config.get_write_lock(CURATED_DB_PATH):
+                bulk_writer.drop_staging(curated_conn, [table_name for table_name, _, _ in dimensions])
+            raise
+        if staged:
+            _update_catalog(audit, batch_id, curated_conn, "Curated", [*staged, "change_log"], trace)
         
-        products.to_sql("dim_products", curated_conn, if_exists="replace", index=False)
-        total_rows += len(products)
+        summary = []
+        for table_name, label, _ in dimensions:
+            if table_name not in staged:
+                summary.append(f"0 {label} (source unchanged, cached)")
+                continue
+            total_rows += rows_changed[table_name]
+            summary.append(f"{rows_staged[table_name]} {label} ({rows_changed[table_name]} new or changed)")
+            
+            if cache is not None:
+                source_checksum = _source_checksum(audit, schemas.CURATED_TABLES[table_name]['source'])
+                with trace("cache", table_name) as span:
+                    frame = _read_frame(curated_conn, table_name, f"SELECT * FROM {table_name}")
+                    cache.put(table_name, source_checksum, frame)
+                    span.rows_out = len(frame)
         
         # Update Watermark
         audit.update_watermark(process_name, datetime.now(), batch_id)
         
         audit.log_end(execution_id, status='SUCCESS', rows_processed=total_rows)
-        print(f"  -> Processed {len(customers)} Customers and {len(products)} Products.")
-        
+        print(f"  -> Merged {' and '.join(summary)}.")
+    
     except Exception as e:
         audit.log_end(execution_id, status='FAILED', error_message=str(e))
         print(f"Error in Dimensions: {e}")
         raise e
     finally:
-        raw_conn.close()
-        curated_conn.close()
+        config.release_connection(raw_conn)
+        config.release_connection(curated_conn)
+
+# Raw source of each fact table, in load order
+FACT_SOURCES = [("orders", "fact_orders"), ("order_lines", "fact_order_lines"), ("payments", "fact_payments")]
+
+def _transform_fact(df, batch_id, transformed_at):
+    """Stamps a fact table's Raw rows with the batch and transformation time.
+    
+    order_date/payment_date were already parsed on read (schemas.SOURCE_DTYPES).
+    """
+    df[SYS_COLS['BATCH_ID']] = batch_id
+    df['transformation_timestamp'] = transformed_at
+    return df
+
+def _stage_facts(raw_conn, curated_conn, batch_id, mode, transformed_at, trace=untracked):
+    """Reads, transforms and stages the fact tables one after another in this process. Returns table -> replace."""
+    replace = {}
+    for raw_table, fact_table in FACT_SOURCES:
+        df, replace[fact_table] = _read_raw_delta(raw_conn, curated_conn, raw_table, fact_table, batch_id, mode, trace)
+        with trace("transform", fact_table) as span:
+            df = _transform_fact(df, batch_id, transformed_at)
+            span.rows_in = span.rows_out = len(df)
+        _stage_rows(curated_conn, fact_table, df, trace)
+    return replace
+
+def _order_partition(order_id, partitions):
+    """Partition of an order_id (stable across processes, unlike hash())."""
+    return zlib.crc32(str(order_id).encode()) % partitions
 
-def load_facts(audit, batch_id):
-    """Processes Orders (Facts)."""
+def _transform_fact_partition(raw_db_path, batch_id, transformed_at, whole_tables, partitions, partition):
+    """Reads and transforms one order_id partition of every fact table (runs in a worker process).
+    
+    whole_tables are the fact tables whose Raw rows are all read, rather than just
+    the batch's. Returns fact table -> (rows, rows read, read seconds, transform
+    seconds); each row is the table's Curated columns, led by the Raw row's rowid.
+    """
+    conn = config.get_db_connection(raw_db_path)
+    conn.create_function("order_partition", 1, partial(_order_partition, partitions=partitions), deterministic=True)
+    try:
+        result = {}
+        for raw_table, fact_table in FACT_SOURCES:
+            started = time.perf_counter()
+            if fact_table in whole_tables:
+                query, params = f"SELECT rowid AS _raw_rowid, * FROM {raw_table} WHERE order_partition(order_id) = ?", (partition,)
+            else:
+                query = f"SELECT rowid AS _raw_rowid, * FROM {raw_table} WHERE batch_id = ? AND order_partition(order_id) = ?"
+                params = (batch_id, partition)
+            df = _read_frame(conn, raw_table, query, params)
+            read_seconds = time.perf_counter() - started
+            
+            started = time.perf_counter()
+            df = _transform_fact(df, batch_id, transformed_at)
+            spec = schemas.CURATED_TABLES[fact_table]
+            rows = bulk_writer.frame_to_rows(df.reindex(columns=['_raw_rowid'] + [name for name, _ in spec['columns']]),
+                                             date_columns=bulk_writer.date_typed_columns(spec['columns']))
+            result[fact_table] = (rows, len(df), read_seconds, time.perf_counter() - started)
+        return result
+    finally:
+        conn.close()
+
+def _stage_facts_partitioned(audit, execution_id, curated_conn, batch_id, mode, transformed_at):
+    """Transforms the fact tables in config.FACT_PARTITIONS order_id partitions on a process pool. Returns table -> replace.
+    
+    Each worker reads and converts its partition of all three tables; this process
+    is the only writer, inserting each partition into the staging tables as it
+    arrives. Rows keep their Raw rowid in staging, so the merge (which goes by
+    staging rowid) sees them in the same order as in single-process mode and the
+    result is identical. Read and transform spans add up the workers' time.
+    """
+    partitions = config.FACT_PARTITIONS
+    replace = {fact_table: mode == "full" or _needs_rebuild(curated_conn, fact_table) for _, fact_table in FACT_SOURCES}
+    spans = {fact_table: (Span("read", raw_table), Span("transform", fact_table), Span("write", fact_table))
+             for raw_table, fact_table in FACT_SOURCES}
+    started_at = datetime.now()
+    columns = {fact_table: ['rowid'] + [name for name, _ in schemas.CURATED_TABLES[fact_table]['columns']]
+               for _, fact_table in FACT_SOURCES}
+    
+    with config.get_write_lock(CURATED_DB_PATH):
+        for _, fact_table in FACT_SOURCES:
+            bulk_writer.create_table(curated_conn, schemas.staging_table(fact_table),
+                                     schemas.CURATED_TABLES[fact_table]['columns'])
+        curated_conn.commit()
+    
+    worker = partial(_transform_fact_partition, RAW_DB_PATH, batch_id, transformed_at,
+                     {fact_table for fact_table, whole in replace.items() if whole}, partitions)
+    # Spawned rather than forked: this process runs threads (scheduler, RSS sampler)
+    with ProcessPoolExecutor(max_workers=min(partitions, os.cpu_count() or 1),
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        for future in as_completed([pool.submit(worker, partition) for partition in range(partitions)]):
+            for fact_table, (rows, rows_read, read_seconds, transform_seconds) in future.result().items():
+                read_span, transform_span, write_span = spans[fact_table]
+                read_span.seconds += read_seconds
+                read_span.add_rows(rows_out=rows_read)
+                transform_span.seconds += transform_seconds
+                transform_span.add_rows(rows_read, len(rows))
+                with write_span.timed(), config.get_write_lock(CURATED_DB_PATH):
+                    curated_conn.execute("BEGIN")
+                    try:
+                        bulk_writer.insert_rows(curated_conn, schemas.staging_table(fact_table), columns[fact_table], rows)
+                        curated_conn.commit()
+                    except Exception:
+                        curated_conn.rollback()
+                        raise
+                write_span.add_rows(len(rows), len(rows))
+    
+    for fact_table, table_spans in spans.items():
+        for span in table_spans:
+            span.start_time = started_at
+            audit.record_span(execution_id, span)
+        bulk_writer.report(fact_table, table_spans[2].rows_out or 0, table_spans[2].seconds)
+    return replace
+
+def load_facts(audit, batch_id, mode=config.LOAD_MODE):
+    """Processes Orders (Facts).
+    
+    Only the batch's Raw rows are read and upserted by primary key into Curated.
+    The three tables are staged first and merged in one transaction (see
+    _publish_curated), so a failure part way leaves Curated as it was.
+    With config.FACT_PARTITIONS > 1 the tables are read and transformed in that
+    many order_id partitions on worker processes (see _stage_facts_partitioned).
+    Each table's read, transform, write and merge is logged as a span.
+    """
     process_name = "Load_Facts"
     execution_id = audit.log_start(process_name, "Curated")
+    trace = partial(audit.span, execution_id)
     total_rows = 0
     
-    raw_conn = config.get_db_connection(RAW_DB_PATH)
-    curated_conn = config.get_db_connection(CURATED_DB_PATH)
+    raw_conn = config.acquire_connection(RAW_DB_PATH)
+    curated_conn = config.acquire_connection(CURATED_DB_PATH)
     
     try:
-        orders = pd.read_sql("SELECT * FROM orders", raw_conn)
-        order_lines = pd.read_sql("SELECT * FROM order_lines", raw_conn)
-        payments = pd.read_sql("SELECT * FROM payments", raw_conn)
-        
-        # Cleaning
-        orders['order_date'] = pd.to_datetime(orders['order_date'])
-        
-        # --- Fact Orders (Pure) ---
-        fact_orders = orders.copy()
-        fact_orders[SYS_COLS['BATCH_ID']] = batch_id
-        fact_orders['transformation_timestamp'] = datetime.now()
-        
-        # --- Fact Order Lines ---
-        fact_order_lines = order_lines.copy()
-        fact_order_lines[SYS_COLS['BATCH_ID']] = batch_id
-        fact_order_lines['transformation_timestamp'] = datetime.now()
-        
-        # --- Fact Payments (New Separate Table) ---
-        fact_payments = payments.copy()
-        fact_payments[SYS_COLS['BATCH_ID']] = batch_id
-        fact_payments['transformation_timestamp'] = datetime.now()
-        
-        # Load to Curated
-        fact_orders.to_sql("fact_orders", curated_conn, if_exists="replace", index=False)
-        fact_order_lines.to_sql("fact_order_lines", curated_conn, if_exists="replace", index=False)
-        fact_payments.to_sql("fact_payments", curated_conn, if_exists="replace", index=False)
+        fact_tables = [fact_table for _, fact_table in FACT_SOURCES]
+        transformed_at = datetime.now()
+        try:
+            if config.FACT_PARTITIONS > 1:
+                replace = _stage_facts_partitioned(audit, execution_id, curated_conn, batch_id, mode, transformed_at)
+            else:
+                replace = _stage_facts(raw_conn, curated_conn, batch_id, mode, transformed_at, trace)
+            
+            # Merge into Curated
+            rows_changed = _publish_curated(curated_conn, replace, trace)
+        except Exception:
+            with config.get_write_lock(CURATED_DB_PATH):
+                bulk_writer.drop_staging(curated_conn, fact_tables)
+            raise
+        _update_catalog(audit, batch_id, curated_conn, "Curated", [*fact_tables, "change_log"], trace)
+        orders_changed, lines_changed, payments_changed = (rows_changed[table_name] for table_name in fact_tables)
         
-        total_rows = len(fact_orders) + len(fact_order_lines) + len(fact_payments)
+        total_rows = orders_changed + lines_changed + payments_changed
         
         # Update Watermark
         audit.update_watermark(process_name, datetime.now(), batch_id)
         
         audit.log_end(execution_id, status='SUCCESS', rows_processed=total_rows)
-        print(f"  -> Processed {len(fact_orders)} Orders, {len(fact_payments)} Payments.")
-        
+        print(f"  -> Merged {orders_changed} Orders, {lines_changed} Order Lines, {payments_changed} Payments (new or changed).")
+    
     except Exception as e:
         audit.log_end(execution_id, status='FAILED', error_message=str(e))
         print(f"Error in Facts: {e}")
         raise e
     finally:
-        raw_conn.close()
-        curated_conn.close()
+        config.release_connection(raw_conn)
+        config.release_connection(curated_conn)
+
+GOLD_TABLES = ["sales_summary_daily", "reporting_sales_wide", "reporting_customer_stats",
+               "sales_summary_weekly", "sales_summary_monthly", "sales_by_category_brand"]
+
+# Key column of each Gold table and the _gold_scope entry holding the keys an incremental run recomputes.
+GOLD_KEYS = {
+    'sales_summary_daily': ('order_date', 'dates'),
+    'reporting_sales_wide': ('order_id', 'order_ids'),
+    'reporting_customer_stats': ('customer_id', 'customer_ids'),
+    'sales_summary_weekly': ('week_start', 'weeks'),
+    'sales_summary_monthly': ('order_month', 'months'),
+    'sales_by_category_brand': ('order_month', 'months'),
+}
+
+def _week_start(day):
+    """Returns the Monday starting the week of a 'YYYY-MM-DD' day, as 'YYYY-MM-DD'."""
+    day = date.fromisoformat(day)
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+def _build_sales_summary_daily(fact_orders, batch_id):
+    """Daily revenue (rounded to cents, see gold_sql.MONEY_SUM), order count and unique customers."""
+    daily_sales = fact_orders.groupby(fact_orders['order_date'].dt.date).agg(
+        total_sales=('total_amount', 'sum'),
+        total_orders=('order_id', 'count'),
+        unique_customers=('customer_id', 'nunique')
+    ).reset_index()
+    daily_sales['total_sales'] = daily_sales['total_sales'].round(2)
+    daily_sales['date'] = daily_sales['order_date']
+    daily_sales[SYS_COLS['BATCH_ID']] = batch_id
+    daily_sales['aggregation_timestamp'] = datetime.now()
+    return daily_sales
+
+def _build_sales_rollup(fact_orders, batch_id, period):
+    """Weekly ('week') or monthly ('month') revenue (rounded to cents), order count and unique customers."""
+    order_dates = fact_orders['order_date']
+    if period == 'week':
+        key = (order_dates.dt.normalize() - pd.to_timedelta(order_dates.dt.weekday, unit='D')).dt.date.rename('week_start')
+    else:
+        key = order_dates.dt.strftime('%Y-%m').rename('order_month')
+    rollup = fact_orders.groupby(key).agg(
+        total_sales=('total_amount', 'sum'),
+        total_orders=('order_id', 'count'),
+        unique_customers=('customer_id', 'nunique')
+    ).reset_index()
+    rollup['total_sales'] = rollup['total_sales'].round(2)
+    rollup[SYS_COLS['BATCH_ID']] = batch_id
+    rollup['aggregation_timestamp'] = datetime.now()
+    return rollup
+
+def _build_sales_by_category_brand(fact_orders, fact_lines, dim_products, batch_id):
+    """Monthly line sales (rounded to cents), quantity and order count per product category and brand."""
+    orders = fact_orders.loc[fact_orders['order_date'].notna(), ['order_id', 'order_date']]
+    lines = fact_lines[['order_id', 'product_id', 'quantity', 'unit_price', 'discount_amount']].merge(orders, on='order_id')
+    lines = lines.merge(dim_products[['product_id', 'category', 'brand']], on='product_id')
+    lines['line_sales'] = lines['quantity'] * lines['unit_price'] - lines['discount_amount'].fillna(0)
+    lines['order_month'] = lines['order_date'].dt.strftime('%Y-%m')
+    rollup = lines.groupby(['order_month', 'category', 'brand'], dropna=False, observed=True).agg(
+        total_sales=('line_sales', 'sum'),
+        total_quantity=('quantity', 'sum'),
+        total_orders=('order_id', 'nunique')
+    ).reset_index()
+    rollup['total_sales'] = rollup['total_sales'].round(2)
+    rollup[SYS_COLS['BATCH_ID']] = batch_id
+    rollup['aggregation_timestamp'] = datetime.now()
+    return rollup
+
+def _iter_reporting_sales_wide(fact_orders, fact_lines, dim_products, dim_customers, fact_payments, batch_id):
+    """One Big Table joining Orders -> Lines -> Products -> Customers -> Payments, in chunks of orders (see wide_join.py)."""
+    aggregation_ts = datetime.now()
+    for chunk in wide_join.iter_wide_chunks(fact_orders, fact_lines, dim_products, dim_customers, fact_payments):
+        chunk[SYS_COLS['BATCH_ID']] = batch_id
+        chunk['aggregation_timestamp'] = aggregation_ts
+        yield chunk
+
+def _build_reporting_sales_wide(fact_orders, fact_lines, dim_products, dim_customers, fact_payments, batch_id):
+    """One Big Table joining Orders -> Lines -> Products -> Customers -> Payments, as a single DataFrame."""
+    return pd.concat(list(_iter_reporting_sales_wide(fact_orders, fact_lines, dim_products, dim_customers, fact_payments, batch_id)),
+                     ignore_index=True)
+
+def _build_customer_stats(fact_orders, dim_customers, batch_id):
+    """Customer lifetime value (rounded to cents) and first/last order dates."""
+    cust_stats = fact_orders.groupby('customer_id', observed=True).agg(
+        first_order=('order_date', 'min'),
+        last_order=('order_date', 'max'),
+        total_spend=('total_amount', 'sum'),
+        orders_count=('order_id', 'count')
+    ).reset_index()
+    cust_stats['total_spend'] = cust_stats['total_spend'].round(2)
+    
+    # Enrich with name
+    cust_stats = cust_stats.merge(dim_customers[['customer_id', 'first_name', 'last_name', 'email']], on='customer_id')
+    
+    cust_stats[SYS_COLS['BATCH_ID']] = batch_id
+    cust_stats['aggregation_timestamp'] = datetime.now()
+    return cust_stats
+
+def _gold_scope(curated_conn, batch_ids):
+    """Finds the order_ids, order dates and customer_ids whose Gold rows the given batches affect.
+    
+    Covers facts and dimensions upserted by those batches plus the prior keys
+    recorded in change_log, so rows that moved away from a date, customer or
+    order are recomputed too.
+    """
+    in_batches = "batch_id IN (SELECT value FROM json_each(?))"
+    params = (json.dumps(batch_ids),)
+    order_ids, dates, customer_ids = set(), set(), set()
+    
+    for order_id, order_date, customer_id in curated_conn.execute(
+            f"SELECT order_id, substr(order_date, 1, 10), customer_id FROM fact_orders WHERE {in_batches}", params):
+        order_ids.add(order_id)
+        dates.add(order_date)
+        customer_ids.add(customer_id)
+    
+    for sql in [
+        f"SELECT order_id FROM fact_order_lines WHERE {in_batches}",
+        f"SELECT order_id FROM fact_payments WHERE {in_batches}",
+        f"SELECT order_id FROM fact_order_lines WHERE product_id IN (SELECT product_id FROM dim_products WHERE {in_batches})",
+    ]:
+        order_ids.update(row[0] for row in curated_conn.execute(sql, params))
+    
+    changed_customers = {row[0] for row in curated_conn.execute(f"SELECT customer_id FROM dim_customers WHERE {in_batches}", params)}
+    customer_ids |= changed_customers
+    order_ids.update(row[0] for row in curated_conn.execute(
+        "SELECT order_id FROM fact_orders WHERE customer_id IN (SELECT value FROM json_each(?))",
+        (json.dumps(sorted(changed_customers)),)
+    ))
+    
+    for table_name, column_name, prior_value in curated_conn.execute(
+            f"SELECT table_name, column_name, prior_value FROM change_log WHERE {in_batches}", params):
+        if column_name == 'order_date':
+            dates.add(prior_value[:10])
+        elif column_name == 'customer_id':
+            customer_ids.add(prior_value)
+        elif column_name == 'order_id':
+            order_ids.add(prior_value)
+    
+    return {'order_ids': order_ids, 'dates': dates, 'customer_ids': customer_ids}
+
+def _gold_needs_rebuild(gold_conn, table_name):
+    """Checks whether a Gold table must be rebuilt in full: it is missing, or lacks a column added to it since.
+    
+    reporting_sales_wide only has the columns the Curated tables provide, so for
+    it only the table itself is checked.
+    """
+    existing = {row[1] for row in gold_conn.execute(f'PRAGMA table_info("{table_name}")')}
+    if table_name == "reporting_sales_wide":
+        return not existing
+    return not existing >= {name for name, _ in schemas.GOLD_TABLES[table_name]['columns']}
+
+def _scope_months(curated_conn, scope):
+    """Returns the 'YYYY-MM' months whose Gold rows an incremental scope touches (Parquet partitions to rewrite)."""
+    months = {day[:7] if day else gold_store.NULL_PARTITION for day in scope['dates']}
+    months.update(row[0] for row in curated_conn.execute(
+        "SELECT DISTINCT COALESCE(substr(order_date, 1, 7), ?) FROM fact_orders WHERE order_id IN (SELECT value FROM json_each(?))",
+        (gold_store.NULL_PARTITION, json.dumps(sorted(scope['order_ids'])))
+    ))
+    return months
+
+def _traced(trace, step, table_name, func, rows_in=None, nested=None):
+    """Runs func() as a span of the stage; its result (a DataFrame or a row count) gives rows_out.
+    
+    nested is a separately logged span timed while func runs (e.g. the lazy wide join
+    feeding a write); its time is taken out of this span's.
+    """
+    with trace(step, table_name) as span:
+        result = func()
+        span.rows_in = rows_in
+        span.rows_out = result if isinstance(result, int) else len(result)
+        if nested is not None:
+            span.rows_in = nested.rows_out
+            span.seconds -= nested.seconds
+    return result
+
+def _gold_inputs(audit, cache, curated_conn, table_name, scope, trace):
+    """Reads the Curated frames one Gold table is built from, only for the scope's dates/weeks/months/orders/customers."""
+    in_list = "IN (SELECT value FROM json_each(?))"
+    if table_name == "sales_summary_daily":
+        dates = json.dumps(sorted(scope['dates']))
+        return {'fact_orders': _read_frame(curated_conn, "fact_orders",
+                                           f"SELECT * FROM fact_orders WHERE substr(order_date, 1, 10) {in_list}", (dates,), trace)}
+    if table_name == "reporting_sales_wide":
+        order_ids = json.dumps(sorted(scope['order_ids']))
+        return {
+            'fact_orders': _read_frame(curated_conn, "fact_orders", f"SELECT * FROM fact_orders WHERE order_id {in_list}", (order_ids,), trace),
+            'fact_order_lines': _read_frame(curated_conn, "fact_order_lines",
+                                            f"SELECT * FROM fact_order_lines WHERE order_id {in_list}", (order_ids,), trace),
+            'dim_products': _dimension_frame(
+                audit, cache, curated_conn, "dim_products",
+                f"WHERE product_id IN (SELECT product_id FROM fact_order_lines WHERE order_id {in_list})", (order_ids,), trace),
+            'dim_customers': _dimension_frame(
+                audit, cache, curated_conn, "dim_customers",
+                f"WHERE customer_id IN (SELECT customer_id FROM fact_orders WHERE order_id {in_list})", (order_ids,), trace),
+            'fact_payments': _read_frame(curated_conn, "fact_payments",
+                                         f"SELECT * FROM fact_payments WHERE order_id {in_list}", (order_ids,), trace),
+        }
+    if table_name == "sales_summary_weekly":
+        weeks = json.dumps(sorted(scope['weeks']))
+        return {'fact_orders': _read_frame(curated_conn, "fact_orders",
+                                           f"SELECT * FROM fact_orders WHERE date(order_date, 'weekday 0', '-6 days') {in_list}",
+                                           (weeks,), trace)}
+    if table_name in ("sales_summary_monthly", "sales_by_category_brand"):
+        months = json.dumps(sorted(scope['months']))
+        frames = {'fact_orders': _read_frame(curated_conn, "fact_orders",
+                                             f"SELECT * FROM fact_orders WHERE substr(order_date, 1, 7) {in_list}", (months,), trace)}
+        if table_name == "sales_by_category_brand":
+            in_months = f"SELECT order_id FROM fact_orders WHERE substr(order_date, 1, 7) {in_list}"
+            frames['fact_order_lines'] = _read_frame(curated_conn, "fact_order_lines",
+                                                     f"SELECT * FROM fact_order_lines WHERE order_id IN ({in_months})", (months,), trace)
+            frames['dim_products'] = _dimension_frame(
+                audit, cache, curated_conn, "dim_products",
+                f"WHERE product_id IN (SELECT product_id FROM fact_order_lines WHERE order_id IN ({in_months}))", (months,), trace)
+        return frames
+    customer_ids = json.dumps(sorted(scope['customer_ids']))
+    return {
+        'fact_orders': _read_frame(curated_conn, "fact_orders", f"SELECT * FROM fact_orders WHERE customer_id {in_list}", (customer_ids,), trace),
+        'dim_customers': _dimension_frame(audit, cache, curated_conn, "dim_customers", f"WHERE customer_id {in_list}", (customer_ids,), trace),
+    }
+
+def _build_gold_table_pandas(audit, cache, batch_id, scope, frames, table_name, gold_conn, execution_id):
+    """Builds one Gold table with pandas into its staging table. Returns the rows written.
+    
+    On a rebuild frames holds every Curated input, loaded once and shared (read-only)
+    by the builders; on an incremental run (frames=None) the builder reads its own
+    inputs for the scope's keys.
+    """
+    trace = partial(audit.span, execution_id)
+    if frames is None:
+        curated_conn = config.acquire_connection(CURATED_DB_PATH)
+        try:
+            frames = _gold_inputs(audit, cache, curated_conn, table_name, scope, trace)
+        finally:
+            config.release_connection(curated_conn)
+    
+    join_span = None
+    if table_name == "sales_summary_daily":
+        daily_sales = _traced(trace, "transform", table_name,
+                              partial(_build_sales_summary_daily, frames['fact_orders'], batch_id), len(frames['fact_orders']))
+        chunks = [daily_sales]
+    elif table_name == "reporting_sales_wide":
+        # The wide join runs chunk by chunk as the rows are written; its time is logged as its own span
+        join_span = Span("transform", table_name)
+        chunks = timed_chunks(_iter_reporting_sales_wide(
+            frames['fact_orders'], frames['fact_order_lines'], frames['dim_products'], frames['dim_customers'],
+            frames['fact_payments'], batch_id), join_span)
+    elif table_name == "reporting_customer_stats":
+        cust_stats = _traced(trace, "transform", table_name,
+                             partial(_build_customer_stats, frames['fact_orders'], frames['dim_customers'], batch_id),
+                             len(frames['fact_orders']))
+        chunks = [cust_stats]
+    elif table_name == "sales_by_category_brand":
+        rollup = _traced(trace, "transform", table_name,
+                         partial(_build_sales_by_category_brand, frames['fact_orders'], frames['fact_order_lines'],
+                                 frames['dim_products'], batch_id),
+                         len(frames['fact_order_lines']))
+        chunks = [rollup]
+    else:
+        period = "week" if table_name == "sales_summary_weekly" else "month"
+        rollup = _traced(trace, "transform", table_name,
+                         partial(_build_sales_rollup, frames['fact_orders'], batch_id, period), len(frames['fact_orders']))
+        chunks = [rollup]
+    
+    rows = _traced(trace, "write", table_name,
+                   partial(bulk_writer.write_frames, gold_conn, schemas.staging_table(table_name), chunks), nested=join_span)
+    if join_span is not None:
+        audit.record_span(execution_id, join_span)
+    return rows
+
+def _build_gold_table_sql(audit, batch_id, scope, table_name, gold_conn, execution_id):
+    """Builds one Gold table inside SQLite into its staging table (see gold_sql.py). Returns the rows written."""
+    return gold_sql.build_gold_table(gold_conn, table_name, batch_id, scope, partial(audit.span, execution_id))
+
+def _gold_staging_path(table_name):
+    """Returns the database file a Gold table is built into (see config.GOLD_STAGING_DIR)."""
+    return config.GOLD_STAGING_DIR / f"{table_name}.db"
+
+def _remove_gold_staging(table_names):
+    """Deletes the staging database files of table_names (and their WAL files), if any."""
+    for table_name in table_names:
+        path = _gold_staging_path(table_name)
+        for file_path in (path, path.with_name(path.name + "-wal"), path.with_name(path.name + "-shm")):
+            file_path.unlink(missing_ok=True)
 
-def aggregate_to_gold(audit, batch_id):
-    """Aggregates Business Metrics."""
+def _run_gold_builder(audit, table_name, build):
+    """Runs build(gold_conn, execution_id) for one Gold table under its own audit entry. Returns the rows it staged.
+    
+    gold_conn is a new connection to the table's own staging database (see
+    config.GOLD_STAGING_DIR), not to gold.db, so no builder waits on another to write.
+    """
+    process_name = f"Aggregate_Gold.{table_name}"
+    execution_id = audit.log_start(process_name, "Gold")
+    _remove_gold_staging([table_name])
+    gold_conn = config.get_db_connection(_gold_staging_path(table_name))
+    try:
+        rows = build(gold_conn, execution_id)
+        audit.log_end(execution_id, status='SUCCESS', rows_processed=rows)
+        return rows
+    except Exception as e:
+        audit.log_end(execution_id, status='FAILED', error_message=str(e))
+        raise
+    finally:
+        gold_conn.close()
+
+def aggregate_to_gold(audit, batch_id, mode=config.LOAD_MODE, cache=None):
+    """Aggregates Business Metrics.
+    
+    In 'incremental' mode only the Gold rows for dates, weeks, months, orders and
+    customers touched since the last successful aggregation are recomputed; the
+    result is identical to a full rebuild. 'full' mode (or missing or outdated Gold
+    tables) rebuilds everything.
+    config.GOLD_ENGINE selects whether the tables are built inside SQLite ('sql',
+    see gold_sql.py) or with pandas ('pandas'). The pandas engine joins against the
+    DimensionCache frames when they are current instead of reading the dimensions
+    again. With config.GOLD_BACKEND = 'parquet' the affected tables/month partitions
+    are then published as Parquet files. Reads, builds and writes are logged as spans.
+    
+    Besides the daily summary, the wide table and the customer stats, the weekly,
+    monthly and category/brand rollups are built, so dashboards need not scan
+    reporting_sales_wide. The tables are built in parallel (see scheduler.run_stages),
+    each into a staging table in its own database file under its own audit entry, so
+    the builds never wait on gold.db's single writer. Only when all of them succeeded
+    are they copied into gold.db and swapped into place, in a single transaction, so
+    Gold is never half-updated.
+    """
     process_name = "Aggregate_Gold"
     execution_id = audit.log_start(process_name, "Gold")
+    trace = partial(audit.span, execution_id)
     total_rows = 0
     
-    curated_conn = config.get_db_connection(CURATED_DB_PATH)
-    gold_conn = config.get_db_connection(GOLD_DB_PATH)
+    curated_conn = config.acquire_connection(CURATED_DB_PATH)
+    gold_conn = config.acquire_connection(GOLD_DB_PATH)
     
     try:
-        # Load necessary tables from Curated
-        fact_orders = pd.read_sql("SELECT * FROM fact_orders", curated_conn)
-        fact_lines = pd.read_sql("SELECT * FROM fact_order_lines", curated_conn)
-        dim_products = pd.read_sql("SELECT * FROM dim_products", curated_conn)
-        dim_customers = pd.read_sql("SELECT * FROM dim_customers", curated_conn)
-        fact_payments = pd.read_sql("SELECT * FROM fact_payments", curated_conn)
-        
-        fact_orders['order_date'] = pd.to_datetime(fact_orders['order_date'])
-        
-        # 1. Sales Summary Daily (Existing)
-        daily_sales = fact_orders.groupby(fact_orders['order_date'].dt.date).agg(
-            total_sales=('total_amount', 'sum'),
-            total_orders=('order_id', 'count')
-        ).reset_index()
-        daily_sales['date'] = daily_sales['order_date']
-        daily_sales[SYS_COLS['BATCH_ID']] = batch_id
-        daily_sales['aggregation_timestamp'] = datetime.now()
-        daily_sales.to_sql("sales_summary_daily", gold_conn, if_exists="replace", index=False)
+        incremental = mode == "incremental" and not any(_gold_needs_rebuild(gold_conn, t) for t in GOLD_TABLES)
+        scope = None
+        if incremental:
+            batch_ids = audit.get_batches_since_last_success(process_name)
+            scope = _gold_scope(curated_conn, batch_ids)
+            scope['weeks'] = {_week_start(day) for day in scope['dates'] if day}
+            scope['months'] = _scope_months(curated_conn, scope)
         
-        # 2. Reporting Sales Wide (New - OBT)
-        # Join: Orders -> Lines -> Products -> Customers -> Payments
-        wide_df = fact_orders.merge(fact_lines, on='order_id', suffixes=('', '_line'))
-        wide_df = wide_df.merge(dim_products, on='product_id', suffixes=('', '_prod'))
-        wide_df = wide_df.merge(dim_customers, on='customer_id', suffixes=('', '_cust'))
-        wide_df = wide_df.merge(fact_payments, on='order_id', how='left', suffixes=('', '_pay')) # Left join for payments
+        if config.GOLD_ENGINE == "sql":
+            build = partial(_build_gold_table_sql, audit, batch_id, scope)
+        else:
+            frames = None
+            if not incremental:
+                # Load necessary tables from Curated (once, for all three builders)
+                frames = {
+                    'fact_orders': _read_frame(curated_conn, "fact_orders", "SELECT * FROM fact_orders", trace=trace),
+                    'fact_order_lines': _read_frame(curated_conn, "fact_order_lines", "SELECT * FROM fact_order_lines", trace=trace),
+                    'dim_products': _dimension_frame(audit, cache, curated_conn, "dim_products", trace=trace),
+                    'dim_customers': _dimension_frame(audit, cache, curated_conn, "dim_customers", trace=trace),
+                    'fact_payments': _read_frame(curated_conn, "fact_payments", "SELECT * FROM fact_payments", trace=trace),
+                }
+            build = partial(_build_gold_table_pandas, audit, cache, batch_id, scope, frames)
         
-        # Select useful columns for BI
-        cols_to_keep = [
-            'order_id', 'order_date', 'status', 'total_amount', 
-            'product_name', 'category', 'sub_category', 'brand', 'quantity', 'line_total',
-            'first_name', 'last_name', 'city', 'state', 'segment',
-            'payment_method', 'payment_amount'
-        ]
-        reporting_sales_wide = wide_df[[c for c in cols_to_keep if c in wide_df.columns]].copy()
-        
-        reporting_sales_wide[SYS_COLS['BATCH_ID']] = batch_id
-        reporting_sales_wide['aggregation_timestamp'] = datetime.now()
-        reporting_sales_wide.to_sql("reporting_sales_wide", gold_conn, if_exists="replace", index=False)
-        
-        # 3. Reporting Customer Stats (New)
-        cust_stats = fact_orders.groupby('customer_id').agg(
-            first_order=('order_date', 'min'),
-            last_order=('order_date', 'max'),
-            total_spend=('total_amount', 'sum'),
-            orders_count=('order_id', 'count')
-        ).reset_index()
+        try:
+            row_counts = run_stages([
+                Stage(table_name, partial(_run_gold_builder, audit, table_name, partial(build, table_name)))
+                for table_name in GOLD_TABLES
+            ])
+            delete_keys = None
+            if incremental:
+                delete_keys = {table_name: (key_column, scope[scope_key]) for table_name, (key_column, scope_key) in GOLD_KEYS.items()}
+            with config.get_write_lock(GOLD_DB_PATH), trace("publish", "gold.db"):
+                bulk_writer.import_staged(gold_conn, {table_name: _gold_staging_path(table_name) for table_name in GOLD_TABLES})
+                bulk_writer.publish_staged(gold_conn, GOLD_TABLES, delete_keys)
+        except Exception:
+            with config.get_write_lock(GOLD_DB_PATH):
+                bulk_writer.drop_staging(gold_conn, GOLD_TABLES)
+            raise
+        finally:
+            _remove_gold_staging(GOLD_TABLES)
+        _update_catalog(audit, batch_id, gold_conn, "Gold", GOLD_TABLES, trace)
+        total_rows = sum(row_counts.values())
         
-        # Enrich with name
-        cust_stats = cust_stats.merge(dim_customers[['customer_id', 'first_name', 'last_name', 'email']], on='customer_id')
-        
-        cust_stats[SYS_COLS['BATCH_ID']] = batch_id
-        cust_stats['aggregation_timestamp'] = datetime.now()
-        cust_stats.to_sql("reporting_customer_stats", gold_conn, if_exists="replace", index=False)
-        
-        total_rows = len(daily_sales) + len(reporting_sales_wide) + len(cust_stats)
+        if config.GOLD_BACKEND == "parquet":
+            with trace("publish", "parquet"):
+                files_written = gold_store.ParquetGoldStore().publish(gold_conn, scope['months'] if incremental else None)
+            print(f"  -> Published Gold tables to Parquet ({files_written} files written) in {config.GOLD_PARQUET_DIR}")
         
         # Update Watermark
         audit.update_watermark(process_name, datetime.now(), batch_id)
         
         audit.log_end(execution_id, status='SUCCESS', rows_processed=total_rows)
-        print(f"  -> Aggregated Daily Sales, Wide Reporting Table ({len(reporting_sales_wide)} rows), and Customer Stats.")
-        
+        print(f"  -> Aggregated Daily Sales, Wide Reporting Table ({row_counts['reporting_sales_wide']} rows), Customer Stats "
+              f"and the weekly/monthly/category rollups "
+              f"({f'incremental, {len(batch_ids) - 1} earlier batches' if incremental else 'full rebuild'}, {config.GOLD_ENGINE} engine).")
+    
     except Exception as e:
         audit.log_end(execution_id, status='FAILED', error_message=str(e))
         print(f"Error in Aggregation: {e}")
         raise e
     finally:
-        curated_conn.close()
-        gold_conn.close()
+        config.release_connection(curated_conn)
+        config.release_connection(gold_conn)
 
-def main():
+def reconcile_layers(audit, batch_id, mode=config.LOAD_MODE):
+    """Updates the per-day reconciliation sketches of the orders in Raw, Curated and Gold, and compares them.
+    
+    Only the order dates touched by the batches since the last successful
+    reconciliation are sketched again (see reconciliation.affected_days), so the
+    cost follows the size of the batch rather than of the tables. 'full' mode, or
+    the first run, sketches every day. The sketches are kept in audit.db, where
+    verify.py compares all days without scanning the layers. Diverging days are
+    reported but don't fail the batch. Each layer's read is logged as a span.
+    """
+    process_name = "Reconcile_Layers"
+    execution_id = audit.log_start(process_name, "System")
+    trace = partial(audit.span, execution_id)
+    
+    raw_conn = config.acquire_connection(RAW_DB_PATH)
+    curated_conn = config.acquire_connection(CURATED_DB_PATH)
+    gold_conn = config.acquire_connection(GOLD_DB_PATH)
+    
+    try:
+        days = None
+        if mode != "full" and audit.has_sketches():
+            days = reconciliation.affected_days(raw_conn, curated_conn, audit.get_batches_since_last_success(process_name))
+        
+        if days == []:
+            audit.log_end(execution_id, status='SUCCESS', rows_processed=0)
+            print("  -> Reconciled 0 days (no orders changed).")
+            return
+        
+        sketches = []
+        readers = [(reconciliation.raw_sketches, raw_conn), (reconciliation.curated_sketches, curated_conn),
+                   (reconciliation.gold_sketches, gold_conn)]
+        for (layer, table_name), (read_sketches, conn) in zip(reconciliation.LAYERS, readers):
+            with trace("read", table_name) as span:
+                layer_sketches = read_sketches(conn, days)
+                span.rows_out = len(layer_sketches)
+            sketches.append(layer_sketches.assign(layer=layer, table_name=table_name))
+        sketches = pd.concat(sketches, ignore_index=True)
+        audit.replace_sketches(sketches, batch_id, days)
+        diverging = reconciliation.compare(sketches)
+        
+        days_reconciled = sketches['partition_date'].nunique()
+        audit.log_end(execution_id, status='SUCCESS', rows_processed=days_reconciled)
+        if diverging.empty:
+            print(f"  -> Reconciled {days_reconciled} days across Raw, Curated and Gold (all match).")
+        else:
+            listed = ", ".join(f"{row.partition_date} ({row.diverges})" for row in diverging.head(5).itertuples())
+            print(f"  -> Reconciled {days_reconciled} days; {len(diverging)} diverge: {listed}"
+                  f"{' ...' if len(diverging) > 5 else ''} (see verify.py).")
+    
+    except Exception as e:
+        audit.log_end(execution_id, status='FAILED', error_message=str(e))
+        print(f"Error in Reconciliation: {e}")
+        raise e
+    finally:
+        config.release_connection(raw_conn)
+        config.release_connection(curated_conn)
+        config.release_connection(gold_conn)
+
+def _resume_stages(audit, stages):
+    """Replaces the stages that already succeeded in the resumed batch with no-ops, keeping their dependencies.
+    
+    Every stage publishes its tables in one transaction, so a stage that did not
+    succeed left nothing behind and simply runs again.
+    """
+    statuses = audit.get_process_statuses()
+    if not statuses:
+        raise ValueError(f"No run logged for batch {audit.batch_id}")
+    resumed = []
+    for stage in stages:
+        if statuses.get(config.STAGE_PROCESSES[stage.name]) == 'SUCCESS':
+            print(f"  -> Skipped {stage.name} (already succeeded in this batch)")
+            stage = Stage(stage.name, lambda: None, stage.depends_on)
+        resumed.append(stage)
+    return resumed
+
+def main(argv=None):
+    """Runs the pipeline. Returns the process exit status: 0 on success, 1 if a stage failed."""
+    parser = argparse.ArgumentParser(description="Enterprise Medallion ETL Pipeline")
+    parser.add_argument("--full-reload", action="store_true",
+                        help="Reload every source file from scratch instead of loading only new data.")
+    parser.add_argument("--rebuild-gold", action="store_true",
+                        help="Rebuild the Gold tables from scratch even on an incremental run.")
+    parser.add_argument("--bulk-load", action="store_true",
+                        help="Use the faster, non-durable bulk load SQLite profile (for initial loads).")
+    parser.add_argument("--profile", action="store_true",
+                        help="Run the stages one at a time under cProfile and tracemalloc and write per-stage "
+                             "reports to the profiles directory (see profiler.py).")
+    parser.add_argument("--resume", metavar="BATCH_ID",
+                        help="Re-run a failed batch, skipping the stages that already succeeded for it. "
+                             "Pass the same options as the failed run.")
+    args = parser.parse_args(argv)
+    mode = "full" if args.full_reload else config.LOAD_MODE
+    if args.bulk_load:
+        config.use_bulk_load_profile()
+    if args.profile:
+        # cProfile only follows its own thread, so nothing may run on worker threads
+        config.MAX_WORKERS = 1
+    
     print("--- Starting Enterprise ETL Pipeline ---")
     
     # 1. Init Audit
-    audit = AuditManager()
+    audit = AuditManager(batch_id=args.resume)
     batch_id = audit.batch_id
-    print(f"Batch ID: {batch_id}")
+    print(f"Batch ID: {batch_id}{' (resumed)' if args.resume else ''}")
+    print(f"Load Mode: {mode}")
+    
+    # Dimension frames shared by the dimension and Gold stages (and persisted between runs)
+    dimension_cache = DimensionCache()
     
     try:
-        # 2. Extract
-        extract_to_raw(audit, batch_id)
-        
-        # 3. Transform (Separated)
-        load_dimensions(audit, batch_id)
-        load_facts(audit, batch_id)
-        
-        # 4. Aggregate
-        aggregate_to_gold(audit, batch_id)
+        # Stage graph: Extract -> Validate -> (Dimensions || Facts) -> Aggregate -> Reconcile
+        stages = [
+            # 2. Extract
+            Stage("extract", partial(extract_to_raw, audit, batch_id, mode=mode)),
+            
+            # 3. Validate - quarantine the Raw rows that fail the data quality rules
+            Stage("validate", partial(validate_raw, audit, batch_id, mode=mode), depends_on=["extract"]),
+            
+            # 4. Transform (Separated) - dimensions and facts are independent
+            Stage("dimensions", partial(load_dimensions, audit, batch_id, mode=mode, cache=dimension_cache),
+                  depends_on=["validate"]),
+            Stage("facts", partial(load_facts, audit, batch_id, mode=mode), depends_on=["validate"]),
+            
+            # 5. Aggregate
+            Stage("gold", partial(aggregate_to_gold, audit, batch_id, mode="full" if args.rebuild_gold else mode,
+                                  cache=dimension_cache),
+                  depends_on=["dimensions", "facts"]),
+            
+            # 6. Reconcile - per-day sketches of Raw, Curated and Gold
+            Stage("reconcile", partial(reconcile_layers, audit, batch_id, mode=mode), depends_on=["gold"]),
+        ]
+        if args.resume:
+            stages = _resume_stages(audit, stages)
+        if args.profile:
+            profiler = StageProfiler(batch_id)
+            stages = [Stage(s.name, profiler.wrap(s.name, s.func), s.depends_on) for s in stages]
+            print(f"Profiling stages into {profiler.out_dir}")
+        run_stages(stages)
         
         print("\nPipeline Competed Successfully.")
-        
+        return 0
+    
     except Exception as e:
         print(f"\nPipeline Failed: {e}")
+        return 1
+    finally:
+        audit.close()
+        config.close_all_connections()
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
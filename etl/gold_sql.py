@@ -0,0 +1,159 @@
+import json
+from datetime import datetime
+import schemas
+from config import CURATED_DB_PATH, SYS_COLS
+from spans import untracked
+
+# Curated tables joined into reporting_sales_wide, in join order. As with the
+# pandas merge chain, a column present in several tables is taken from the first.
+WIDE_JOIN_TABLES = [
+    ('o', 'fact_orders'),
+    ('l', 'fact_order_lines'),
+    ('p', 'dim_products'),
+    ('c', 'dim_customers'),
+    ('pay', 'fact_payments'),
+]
+
+IN_LIST = "IN (SELECT value FROM json_each(?))"
+
+# Money sums use SQLite's native TOTAL (SUM, but 0.0 for an empty or all-NULL group,
+# like pandas) rounded to cents: SQLite adds naively, so the last bits would
+# otherwise depend on the summation order and differ from the pandas engine's.
+MONEY_SUM = "ROUND(TOTAL({}), 2)"
+
+def _wide_select_columns(conn):
+    """Resolves each reporting_sales_wide column to the alias of the Curated table it comes from."""
+    table_columns = {
+        alias: {row[1] for row in conn.execute(f'PRAGMA curated.table_info("{table}")')}
+        for alias, table in WIDE_JOIN_TABLES
+    }
+    resolved = []
+    for column in schemas.REPORTING_WIDE_COLUMNS:
+        alias = next((a for a, _ in WIDE_JOIN_TABLES if column in table_columns[a]), None)
+        if alias:
+            resolved.append((column, alias))
+    return resolved
+
+def _daily_sales_sql(where):
+    return f"""
+        SELECT date(o.order_date), {MONEY_SUM.format('o.total_amount')}, COUNT(o.order_id), COUNT(DISTINCT o.customer_id),
+               date(o.order_date), ?, ?
+        FROM curated.fact_orders o
+        WHERE o.order_date IS NOT NULL {where}
+        GROUP BY date(o.order_date)
+        ORDER BY date(o.order_date)
+    """
+
+# Period an order falls in, for the weekly and monthly rollups (weeks start on Monday)
+WEEK_SQL = "date(o.order_date, 'weekday 0', '-6 days')"
+MONTH_SQL = "substr(o.order_date, 1, 7)"
+
+def _period_sales_sql(period, where):
+    return f"""
+        SELECT {period}, {MONEY_SUM.format('o.total_amount')}, COUNT(o.order_id), COUNT(DISTINCT o.customer_id), ?, ?
+        FROM curated.fact_orders o
+        WHERE o.order_date IS NOT NULL {where}
+        GROUP BY {period}
+        ORDER BY {period}
+    """
+
+def _category_brand_sql(where):
+    return f"""
+        SELECT {MONTH_SQL}, p.category, p.brand,
+               {MONEY_SUM.format('l.quantity * l.unit_price - COALESCE(l.discount_amount, 0)')}, SUM(l.quantity),
+               COUNT(DISTINCT o.order_id), ?, ?
+        FROM curated.fact_orders o
+        JOIN curated.fact_order_lines l ON l.order_id = o.order_id
+        JOIN curated.dim_products p ON p.product_id = l.product_id
+        WHERE o.order_date IS NOT NULL {where}
+        GROUP BY {MONTH_SQL}, p.category, p.brand
+        ORDER BY {MONTH_SQL}, p.category, p.brand
+    """
+
+def _wide_sql(select_columns, where):
+    select_list = ", ".join(f'{alias}."{column}"' for column, alias in select_columns)
+    return f"""
+        SELECT {select_list}, ?, ?
+        FROM curated.fact_orders o
+        JOIN curated.fact_order_lines l ON l.order_id = o.order_id
+        JOIN curated.dim_products p ON p.product_id = l.product_id
+        JOIN curated.dim_customers c ON c.customer_id = o.customer_id
+        LEFT JOIN curated.fact_payments pay ON pay.order_id = o.order_id
+        WHERE 1 = 1 {where}
+    """
+
+def _customer_stats_sql(where):
+    return f"""
+        SELECT o.customer_id, MIN(o.order_date), MAX(o.order_date), {MONEY_SUM.format('o.total_amount')}, COUNT(o.order_id),
+               c.first_name, c.last_name, c.email, ?, ?
+        FROM curated.fact_orders o
+        JOIN curated.dim_customers c ON c.customer_id = o.customer_id
+        WHERE 1 = 1 {where}
+        GROUP BY o.customer_id
+        ORDER BY o.customer_id
+    """
+
+def build_gold_table(gold_conn, table_name, batch_id, scope=None, trace=untracked):
+    """Builds one Gold table into its staging table entirely inside SQLite with INSERT INTO ... SELECT.
+    
+    gold_conn is a connection to the table's own staging database (see
+    etl_pipeline._run_gold_builder), so builders running in parallel don't wait on
+    each other to write. curated.db is attached to it, and every aggregate is a
+    native SQLite one, so no row passes through Python.
+    With scope=None the staging table gets every row; otherwise scope holds the
+    'dates', 'order_ids', 'customer_ids', 'weeks' and 'months' to recompute (see
+    etl_pipeline._gold_scope) and it only gets those rows. aggregate_to_gold then
+    copies it into gold.db and swaps it into place. The write is timed as a 'build'
+    span with trace. Returns the rows written.
+    """
+    gold_conn.execute("ATTACH DATABASE ? AS curated", (str(CURATED_DB_PATH),))
+    try:
+        wide_columns = _wide_select_columns(gold_conn)
+        stamp = (batch_id, datetime.now().isoformat(sep=" "))
+        
+        if scope is None:
+            select_sql, params = {
+                'sales_summary_daily': (_daily_sales_sql(""), ()),
+                'reporting_sales_wide': (_wide_sql(wide_columns, ""), ()),
+                'reporting_customer_stats': (_customer_stats_sql(""), ()),
+                'sales_summary_weekly': (_period_sales_sql(WEEK_SQL, ""), ()),
+                'sales_summary_monthly': (_period_sales_sql(MONTH_SQL, ""), ()),
+                'sales_by_category_brand': (_category_brand_sql(""), ()),
+            }[table_name]
+        else:
+            dates = json.dumps(sorted(scope['dates']))
+            order_ids = json.dumps(sorted(scope['order_ids']))
+            customer_ids = json.dumps(sorted(scope['customer_ids']))
+            weeks = json.dumps(sorted(scope['weeks']))
+            months = json.dumps(sorted(scope['months']))
+            select_sql, params = {
+                'sales_summary_daily': (_daily_sales_sql(f"AND date(o.order_date) {IN_LIST}"), (dates,)),
+                'reporting_sales_wide': (_wide_sql(wide_columns, f"AND o.order_id {IN_LIST}"), (order_ids,)),
+                'reporting_customer_stats': (_customer_stats_sql(f"AND o.customer_id {IN_LIST}"), (customer_ids,)),
+                'sales_summary_weekly': (_period_sales_sql(WEEK_SQL, f"AND {WEEK_SQL} {IN_LIST}"), (weeks,)),
+                'sales_summary_monthly': (_period_sales_sql(MONTH_SQL, f"AND {MONTH_SQL} {IN_LIST}"), (months,)),
+                'sales_by_category_brand': (_category_brand_sql(f"AND {MONTH_SQL} {IN_LIST}"), (months,)),
+            }[table_name]
+        
+        columns = schemas.GOLD_TABLES[table_name]['columns']
+        if table_name == 'reporting_sales_wide':
+            selected = {column for column, _ in wide_columns} | {SYS_COLS['BATCH_ID'], 'aggregation_timestamp'}
+            columns = [(name, col_type) for name, col_type in columns if name in selected]
+        column_list = ", ".join(f'"{name}"' for name, _ in columns)
+        staging = schemas.staging_table(table_name)
+        
+        with trace("build", table_name) as span:
+            gold_conn.execute("BEGIN")
+            try:
+                gold_conn.execute(f'DROP TABLE IF EXISTS "{staging}"')
+                gold_conn.execute(schemas.create_table_sql(staging, columns))
+                # The batch_id/timestamp placeholders come first in the SELECT list, before any WHERE parameters
+                cursor = gold_conn.execute(f'INSERT INTO "{staging}" ({column_list}) {select_sql}', stamp + params)
+                gold_conn.commit()
+            except Exception:
+                gold_conn.rollback()
+                raise
+            span.rows_out = cursor.rowcount
+        return cursor.rowcount
+    finally:
+        gold_conn.execute("DETACH DATABASE curated")
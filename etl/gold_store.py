@@ -0,0 +1,151 @@
+import json
+import os
+import shutil
+import pandas as pd
+import config
+import schemas
+from config import GOLD_DB_PATH, GOLD_PARQUET_DIR, GOLD_PARQUET_PARTITIONS
+
+# Hive-style partition key of the monthly Parquet partitions (order_month=YYYY-MM).
+PARTITION_COLUMN = 'order_month'
+# Partition for rows whose date is NULL.
+NULL_PARTITION = 'unknown'
+
+def _require_pyarrow():
+    """pyarrow is only needed by the 'parquet' backend, so it is imported on first use."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("The 'parquet' Gold backend requires pyarrow (pip install pyarrow).") from e
+
+class SQLiteGoldStore:
+    """Reads Gold tables from gold.db."""
+    name = 'sqlite'
+
+    def __init__(self, db_path=GOLD_DB_PATH):
+        self.location = db_path
+
+    def read_table(self, table_name, columns=None, limit=None):
+        """Returns a Gold table (optionally only some columns / the first rows) as a DataFrame."""
+        column_list = ", ".join(f'"{c}"' for c in columns) if columns else "*"
+        query = f'SELECT {column_list} FROM "{table_name}"'
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        conn = config.get_db_connection(self.location)
+        try:
+            return pd.read_sql(query, conn)
+        finally:
+            conn.close()
+
+class ParquetGoldStore:
+    """Gold tables as Parquet datasets, one directory per table under GOLD_PARQUET_DIR.
+    
+    Tables listed in GOLD_PARQUET_PARTITIONS are split into one partition per month
+    (<table>/order_month=YYYY-MM/part-0.parquet), so an incremental run only rewrites
+    the months it touched and readers filtering on months only open those files.
+    Other tables are a single part-0.parquet file.
+    """
+    name = 'parquet'
+
+    def __init__(self, root=GOLD_PARQUET_DIR):
+        self.location = root
+
+    def read_table(self, table_name, columns=None, limit=None, months=None):
+        """Returns a Gold table as a DataFrame, reading only the requested columns.
+        
+        months optionally restricts a partitioned table to those 'YYYY-MM' partitions.
+        """
+        _require_pyarrow()
+        import pyarrow.dataset as ds
+        
+        table_dir = self.location / table_name
+        if not table_dir.exists():
+            raise FileNotFoundError(f"No Parquet data for Gold table '{table_name}' in {self.location}")
+        dataset = ds.dataset(table_dir, format="parquet", partitioning="hive")
+        columns = columns or [name for name in dataset.schema.names if name != PARTITION_COLUMN]
+        row_filter = ds.field(PARTITION_COLUMN).isin(sorted(months)) if months is not None else None
+        
+        if limit is not None:
+            table = dataset.head(int(limit), columns=columns, filter=row_filter)
+        else:
+            table = dataset.to_table(columns=columns, filter=row_filter)
+        return table.to_pandas()
+
+    def publish(self, gold_conn, months=None):
+        """Writes the Gold tables from gold.db to Parquet. Returns the number of files written.
+        
+        With months=None every table is rewritten into a new directory that then
+        replaces the old one. Otherwise only those month partitions of the
+        partitioned tables are rewritten (a month left without rows is removed);
+        unpartitioned tables are always rewritten whole.
+        """
+        _require_pyarrow()
+        files_written = 0
+        for table_name in schemas.GOLD_TABLES:
+            table_dir = self.location / table_name
+            date_column = GOLD_PARQUET_PARTITIONS.get(table_name)
+            
+            if months is not None and table_dir.exists():
+                files_written += self._write_table(gold_conn, table_name, table_dir, date_column, months)
+                continue
+            
+            staging_dir = table_dir.with_name(f"{table_name}.tmp")
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            files_written += self._write_table(gold_conn, table_name, staging_dir, date_column, None)
+            staging_dir.mkdir(parents=True, exist_ok=True)
+            if table_dir.exists():
+                retired_dir = table_dir.with_name(f"{table_name}.old")
+                shutil.rmtree(retired_dir, ignore_errors=True)
+                os.replace(table_dir, retired_dir)
+                os.replace(staging_dir, table_dir)
+                shutil.rmtree(retired_dir)
+            else:
+                os.replace(staging_dir, table_dir)
+        return files_written
+
+    def _read_gold(self, gold_conn, table_name, date_column, months):
+        """Reads a Gold table (or the given months of it) from gold.db with typed date columns."""
+        query = f'SELECT * FROM "{table_name}"'
+        params = ()
+        if date_column and months is not None:
+            query += f' WHERE COALESCE(substr("{date_column}", 1, 7), ?) IN (SELECT value FROM json_each(?))'
+            params = (NULL_PARTITION, json.dumps(sorted(months)))
+        df = pd.read_sql(query, gold_conn, params=params)
+        
+        types = dict(schemas.GOLD_TABLES[table_name]['columns'])
+        for col in df.columns:
+            if types.get(col) in ('TIMESTAMP', 'DATE'):
+                df[col] = pd.to_datetime(df[col], format="ISO8601")
+        return df
+
+    def _write_table(self, gold_conn, table_name, table_dir, date_column, months):
+        df = self._read_gold(gold_conn, table_name, date_column, months)
+        if not date_column:
+            _write_parquet(df, table_dir)
+            return 1
+        
+        month_of_row = df[date_column].dt.strftime("%Y-%m").fillna(NULL_PARTITION)
+        for month in set(months or []) - set(month_of_row):
+            shutil.rmtree(table_dir / f"{PARTITION_COLUMN}={month}", ignore_errors=True)
+        for month, rows in df.groupby(month_of_row, sort=True):
+            _write_parquet(rows, table_dir / f"{PARTITION_COLUMN}={month}")
+        return month_of_row.nunique()
+
+def _write_parquet(df, directory):
+    """Writes df to directory/part-0.parquet, replacing any previous file atomically."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    directory.mkdir(parents=True, exist_ok=True)
+    staging_path = directory / ".part-0.parquet.tmp"  # dot-files are skipped by dataset discovery
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), staging_path, compression="zstd")
+    os.replace(staging_path, directory / "part-0.parquet")
+
+def open_gold_store(backend=None):
+    """Returns the reader for a Gold backend ('sqlite' or 'parquet'; default config.GOLD_BACKEND)."""
+    backend = backend or config.GOLD_BACKEND
+    if backend == 'sqlite':
+        return SQLiteGoldStore()
+    if backend == 'parquet':
+        return ParquetGoldStore()
+    raise ValueError(f"Unknown Gold backend: {backend}")
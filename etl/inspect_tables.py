@@ -1,48 +1,78 @@
-import sqlite3
-import pandas as pd
+import argparse
+import json
 import os
+import catalog
+from config import RAW_DB_PATH, CURATED_DB_PATH, GOLD_DB_PATH, AUDIT_DB_PATH
 
 # Configuration
 DB_PATHS = {
-    "RAW": "data/Target/Raw/raw.db",
-    "CURATED": "data/Target/Curated/curated.db",
-    "GOLD": "data/Target/Gold/gold.db",
-    "AUDIT": "data/Target/System/audit.db"
+    "RAW": RAW_DB_PATH,
+    "CURATED": CURATED_DB_PATH,
+    "GOLD": GOLD_DB_PATH,
+    "AUDIT": AUDIT_DB_PATH
 }
 
-def inspect_database(zone_name, db_path):
+# Database each zone's tables are catalogued under (audit.db itself isn't catalogued)
+CATALOG_DATABASES = {"RAW": "Raw", "CURATED": "Curated", "GOLD": "Gold"}
+
+def _format_size(size_bytes):
+    if size_bytes is None:
+        return "unknown"
+    if size_bytes < 1024 ** 2:
+        return f"{size_bytes / 1024:,.1f} KB"
+    return f"{size_bytes / 1024 ** 2:,.2f} MB"
+
+def inspect_database(zone_name, db_path, samples=False):
+    """Describes each table of a zone from the table catalog in audit.db (see catalog.py).
+    
+    Only the database's schema is read, with sqlite3 alone, unless samples is set:
+    then the first 3 rows of every table are fetched as well (through pandas).
+    """
     print(f"\n{'='*20} {zone_name} ZONE {'='*20}")
     print(f"Path: {db_path}")
     
     if not os.path.exists(db_path):
         print("❌ Database file not found!")
         return
-
-    conn = sqlite3.connect(db_path)
+    
     try:
-        # Get all tables
-        tables = pd.read_sql("SELECT name FROM sqlite_master WHERE type='table'", conn)
+        tables = catalog.list_tables(db_path)
+        entries = catalog.read_catalog(CATALOG_DATABASES[zone_name]) if zone_name in CATALOG_DATABASES else []
+        entries = {entry['table_name']: entry for entry in entries}
         
-        if tables.empty:
+        if not tables:
             print("⚠️  No tables found in this database.")
         
-        for table in tables['name']:
+        for table, columns in tables.items():
             print(f"\n>> Table: [{table}]")
-            # Get count
-            count = pd.read_sql(f"SELECT COUNT(*) as c FROM {table}", conn).iloc[0]['c']
-            print(f"   Total Rows: {count}")
+            entry = entries.get(table)
+            if entry is None:
+                print("   Total Rows: not catalogued")
+            else:
+                columns = json.loads(entry['columns'])
+                print(f"   Total Rows: {entry['row_count']:,}  |  Size: {_format_size(entry['size_bytes'])}  |  "
+                      f"Last Batch: {entry['last_batch_id'][:8]} ({entry['updated_at']})")
+                for kind in ('key', 'date'):
+                    if entry[f'{kind}_column']:
+                        print(f"   {kind.title()} [{entry[f'{kind}_column']}]: {entry[f'{kind}_min']} .. {entry[f'{kind}_max']}")
+            print(f"   Columns: {', '.join(f'{name} {col_type}'.strip() for name, col_type in columns)}")
             
-            # Get sample data
-            df = pd.read_sql(f"SELECT * FROM {table} LIMIT 3", conn)
-            print(f"   Sample Data (First 3 rows):")
-            print(df.to_string(index=False))
+            if samples:
+                # Imported here so pandas only loads for samples, which go through the shared result cache (query_layer.py)
+                from query_layer import cache
+                df = cache.query(db_path, f'SELECT * FROM "{table}" LIMIT 3')
+                print(f"   Sample Data (First 3 rows):")
+                print(df.to_string(index=False))
             print("-" * 50)
-            
+    
     except Exception as e:
         print(f"❌ Error inspecting {zone_name}: {e}")
-    finally:
-        conn.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Describe the tables of each zone from the table catalog")
+    parser.add_argument("--zone", choices=list(DB_PATHS), help="Only inspect this zone.")
+    parser.add_argument("--samples", action="store_true", help="Also read the first 3 rows of every table.")
+    args = parser.parse_args()
     for zone, path in DB_PATHS.items():
-        inspect_database(zone, path)
+        if args.zone in (None, zone):
+            inspect_database(zone, path, args.samples)
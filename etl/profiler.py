@@ -0,0 +1,110 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from functools import wraps
+from config import PROFILE_DIR, PROFILE_TOP_N
+
+# Seconds between checks of traced memory for a new peak, and how much it must have
+# grown since the last snapshot (x1.1 = 10%) before another snapshot is taken.
+PEAK_POLL_SECONDS = 0.05
+PEAK_GROWTH = 1.1
+
+class _PeakSnapshots:
+    """Keeps a tracemalloc snapshot taken close to the peak of traced memory.
+    
+    A background thread polls the traced size and snapshots each time it grows by
+    PEAK_GROWTH, so only a handful of (costly) snapshots are taken per stage.
+    """
+    def __init__(self):
+        self.snapshot = None
+        self.size = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="tracemalloc-peaks", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.take()
+
+    def take(self):
+        current, _ = tracemalloc.get_traced_memory()
+        if current > self.size:
+            self.snapshot, self.size = tracemalloc.take_snapshot(), current
+
+    def _run(self):
+        while not self._stop.wait(PEAK_POLL_SECONDS):
+            current, _ = tracemalloc.get_traced_memory()
+            if current > self.size * PEAK_GROWTH:
+                self.take()
+
+class StageProfiler:
+    """Runs pipeline stages under cProfile and tracemalloc (etl_pipeline.py --profile).
+    
+    For each wrapped stage it writes, under PROFILE_DIR/<batch_id>/:
+      <stage>.prof - the cProfile dump (open with pstats or snakeviz)
+      <stage>.txt  - wall time, peak traced memory, the top PROFILE_TOP_N functions
+                     by cumulative time and the top allocation sites holding memory
+                     near the peak
+    cProfile only sees the thread it runs in and tracemalloc counts the whole
+    process, so the stages must run one at a time (config.MAX_WORKERS = 1).
+    Nothing is wrapped, and nothing costs anything, unless --profile is given.
+    """
+    def __init__(self, batch_id, profile_dir=PROFILE_DIR, top_n=PROFILE_TOP_N):
+        self.out_dir = profile_dir / batch_id
+        self.top_n = top_n
+
+    def wrap(self, stage_name, func):
+        """Returns func wrapped so that each call is profiled as stage_name."""
+        @wraps(func)
+        def profiled(*args, **kwargs):
+            return self.run(stage_name, func, *args, **kwargs)
+        return profiled
+
+    def run(self, stage_name, func, *args, **kwargs):
+        """Calls func under the profilers and writes its reports, even if it fails."""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        profile = cProfile.Profile()
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            with _PeakSnapshots() as peaks:
+                profile.enable()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    profile.disable()
+        finally:
+            seconds = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self._write_reports(stage_name, profile, peaks, peak, seconds)
+
+    def _write_reports(self, stage_name, profile, peaks, peak, seconds):
+        profile.dump_stats(self.out_dir / f"{stage_name}.prof")
+        
+        report = io.StringIO()
+        report.write(f"Stage: {stage_name}\n")
+        report.write(f"Wall time: {seconds:.3f}s (under the profiler)\n")
+        report.write(f"Peak traced memory: {peak / 1024 ** 2:.1f} MB\n\n")
+        
+        report.write(f"--- Top {self.top_n} functions by cumulative time ---\n")
+        pstats.Stats(profile, stream=report).sort_stats("cumulative").print_stats(self.top_n)
+        
+        # Ignore the profilers' own bookkeeping
+        snapshot = peaks.snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ])
+        report.write(f"--- Top {self.top_n} allocation sites (of {peaks.size / 1024 ** 2:.1f} MB traced near the peak) ---\n")
+        for stat in snapshot.statistics("lineno")[:self.top_n]:
+            frame = stat.traceback[0]
+            report.write(f"{stat.size / 1024:>12,.1f} KiB {stat.count:>10,} blocks  {frame.filename}:{frame.lineno}\n")
+        
+        (self.out_dir / f"{stage_name}.txt").write_text(report.getvalue())
@@ -1,41 +1,51 @@
-import pandas as pd
-import config
-from config import GOLD_DB_PATH, RAW_DB_PATH
+import argparse
+from config import RAW_DB_PATH
+from gold_store import open_gold_store
+from query_layer import cache
 
-def query_gold_sales():
+def query_gold_sales(backend=None):
     """Example: Querying the Gold Zone for daily sales."""
-    print(f"--- Querying Gold Database: {GOLD_DB_PATH} ---")
+    gold_store = open_gold_store(backend)
+    print(f"--- Querying Gold ({gold_store.name}): {gold_store.location} ---")
     
-    conn = config.get_db_connection(GOLD_DB_PATH)
     try:
-        query = """
-        SELECT date, total_sales, unique_customers 
-        FROM sales_summary_daily 
-        ORDER BY total_sales DESC 
-        LIMIT 5
-        """
+        # Only the needed columns are read, which is what the Parquet backend is fast at
+        df = cache.read_gold("sales_summary_daily", columns=["date", "total_sales", "unique_customers"], backend=backend)
         print("\nTop 5 Days by Sales:")
-        df = pd.read_sql(query, conn)
-        print(df)
+        print(df.nlargest(5, "total_sales").reset_index(drop=True))
+    except Exception as e:
+        print(f"Error: {e}")
+
+def query_gold_rollups(backend=None):
+    """Example: Dashboard figures from the pre-aggregated rollups (no scan of reporting_sales_wide)."""
+    try:
+        monthly = cache.read_gold("sales_summary_monthly", columns=["order_month", "total_sales", "total_orders", "unique_customers"],
+                                  backend=backend)
+        print("\nMonthly Sales:")
+        print(monthly.sort_values("order_month").to_string(index=False))
+        
+        by_brand = cache.read_gold("sales_by_category_brand", columns=["category", "brand", "total_sales", "total_quantity"],
+                                   backend=backend)
+        top_categories = by_brand.groupby("category", dropna=False)[["total_sales", "total_quantity"]].sum()
+        print("\nSales by Category:")
+        print(top_categories.sort_values("total_sales", ascending=False).round(2))
     except Exception as e:
         print(f"Error: {e}")
-    finally:
-        conn.close()
 
 def query_raw_count():
     """Example: Counting rows in Raw Customer table."""
     print(f"\n--- Querying Raw Database: {RAW_DB_PATH} ---")
     
-    conn = config.get_db_connection(RAW_DB_PATH)
     try:
-        query = "SELECT COUNT(*) as count FROM customers"
-        df = pd.read_sql(query, conn)
-        print(f"Total Raw Customers: {df.iloc[0]['count']}")
+        print(f"Total Raw Customers: {cache.row_count(RAW_DB_PATH, 'customers')}")
     except Exception as e:
         print(f"Error: {e}")
-    finally:
-        conn.close()
 
 if __name__ == "__main__":
-    query_gold_sales()
+    parser = argparse.ArgumentParser(description="Example Gold and Raw queries")
+    parser.add_argument("--backend", choices=["sqlite", "parquet"],
+                        help="Gold storage backend to read (default: config.GOLD_BACKEND).")
+    backend = parser.parse_args().backend
+    query_gold_sales(backend)
+    query_gold_rollups(backend)
     query_raw_count()
@@ -0,0 +1,97 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import partial
+import pandas as pd
+import config
+from config import RAW_DB_PATH, CURATED_DB_PATH, GOLD_DB_PATH, AUDIT_DB_PATH
+from gold_store import open_gold_store
+
+# Watermarks (pipeline_watermark) whose batch_id identifies what each database holds.
+# They move to the new batch_id whenever a batch lands in the database.
+VERSION_WATERMARKS = {
+    str(RAW_DB_PATH): ['Extract_Source_to_Raw'],
+    str(CURATED_DB_PATH): ['Load_Dimensions', 'Load_Facts'],
+    str(GOLD_DB_PATH): ['Aggregate_Gold'],
+}
+
+class QueryCache:
+    """Runs read-only queries on the zone databases, keeping the results in an LRU cache.
+    
+    A result is cached under its database, SQL and parameters plus the batch_id
+    that last loaded the database (for Gold, the last Aggregate_Gold batch). When
+    a new batch lands the key changes, so stale results are never returned; they
+    just age out. audit.db, which every pipeline step writes to, and databases no
+    batch has been logged for are read fresh every time. Connections come from the
+    config pool, so repeated queries don't reopen the database file.
+    """
+    def __init__(self, max_entries=config.QUERY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def data_version(self, db_path):
+        """Returns the batch_id(s) the database was last loaded by, or None if it isn't versioned."""
+        processes = VERSION_WATERMARKS.get(str(db_path))
+        if processes is None or not AUDIT_DB_PATH.exists():
+            return None
+        placeholders = ", ".join("?" for _ in processes)
+        # Runs on every lookup, cache hits included, so it stays a plain sqlite3 read
+        conn = config.acquire_connection(AUDIT_DB_PATH)
+        try:
+            versions = conn.execute(f"""
+                SELECT process_name, last_batch_id FROM pipeline_watermark
+                WHERE process_name IN ({placeholders}) ORDER BY process_name
+            """, processes).fetchall()
+        except sqlite3.Error:
+            return None
+        finally:
+            config.release_connection(conn)
+        return tuple(versions) or None
+
+    def query(self, db_path, sql, params=()):
+        """Returns the result of a SELECT on a database as a DataFrame."""
+        version = self.data_version(db_path)
+        if version is None:
+            return self._read(db_path, sql, params)
+        return self._cached((str(db_path), sql, tuple(params), version), partial(self._read, db_path, sql, params))
+
+    def read_gold(self, table_name, columns=None, limit=None, backend=None):
+        """Returns a Gold table from the configured (or given) backend, see gold_store.read_table."""
+        gold_store = open_gold_store(backend)
+        version = self.data_version(GOLD_DB_PATH)
+        load = partial(gold_store.read_table, table_name, columns=columns, limit=limit)
+        if version is None:
+            return load()
+        return self._cached((gold_store.name, table_name, tuple(columns or ()), limit, version), load)
+
+    def row_count(self, db_path, table_name):
+        """Returns the number of rows in a table."""
+        return int(self.query(db_path, f'SELECT COUNT(*) AS c FROM "{table_name}"').iloc[0]['c'])
+
+    def _cached(self, key, load):
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return self._results[key].copy(deep=False)
+        df = load()
+        with self._lock:
+            self.misses += 1
+            self._results[key] = df
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        # Shallow copies are copy-on-write, so callers can't change the cached frame
+        return df.copy(deep=False)
+
+    def _read(self, db_path, sql, params=()):
+        conn = config.acquire_connection(db_path)
+        try:
+            return pd.read_sql(sql, conn, params=tuple(params))
+        finally:
+            config.release_connection(conn)
+
+# Shared by the query tools within a process
+cache = QueryCache()
@@ -1,37 +1,35 @@
-import sqlite3
-import pandas as pd
 import os
+import catalog
+from config import RAW_DB_PATH, CURATED_DB_PATH, GOLD_DB_PATH, AUDIT_DB_PATH
 
 DB_PATHS = {
-    "1": ("Raw", "data/Target/Raw/raw.db"),
-    "2": ("Curated", "data/Target/Curated/curated.db"),
-    "3": ("Gold", "data/Target/Gold/gold.db"),
-    "4": ("Audit", "data/Target/System/audit.db")
+    "1": ("Raw", RAW_DB_PATH),
+    "2": ("Curated", CURATED_DB_PATH),
+    "3": ("Gold", GOLD_DB_PATH),
+    "4": ("Audit", AUDIT_DB_PATH)
 }
 
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
 
 def get_tables(db_path):
-    conn = sqlite3.connect(db_path)
-    try:
-        tables = pd.read_sql("SELECT name FROM sqlite_master WHERE type='table'", conn)
-        return tables['name'].tolist()
-    finally:
-        conn.close()
+    return list(catalog.list_tables(db_path))
+
+def get_row_counts(name):
+    """Returns table -> row count as recorded in the table catalog for a database (see catalog.py)."""
+    return {entry['table_name']: entry['row_count'] for entry in catalog.read_catalog(name)}
 
 def show_data(db_path, table_name):
-    conn = sqlite3.connect(db_path)
+    # Imported here so the menus start without pandas; results are cached until the next batch lands (see query_layer.py)
+    from query_layer import cache
     try:
-        df = pd.read_sql(f"SELECT * FROM {table_name} LIMIT 10", conn)
+        df = cache.query(db_path, f'SELECT * FROM "{table_name}" LIMIT 10')
         print(f"\n--- Data: {table_name} (First 10 rows) ---")
         print(df.to_string(index=False))
         input("\nPress Enter to continue...")
     except Exception as e:
         print(f"Error: {e}")
         input("Press Enter...")
-    finally:
-        conn.close()
 
 def main():
     while True:
@@ -45,26 +43,27 @@ def main():
         choice = input("\nSelect (1-4): ").strip().upper()
         if choice == 'Q':
             break
-            
+        
         if choice in DB_PATHS:
             name, path = DB_PATHS[choice]
             if not os.path.exists(path):
                 print(f"❌ Database {name} not found!")
                 input("Press Enter...")
                 continue
-                
+            
             while True:
                 clear_screen()
                 print(f"=== DATABASE: {name} ===")
                 tables = get_tables(path)
+                row_counts = get_row_counts(name)
                 
                 if not tables:
                     print("(No tables found)")
                     input("Press Enter...")
                     break
-                    
+                
                 for i, t in enumerate(tables, 1):
-                    print(f"{i}. {t}")
+                    print(f"{i}. {t}" + (f" ({row_counts[t]:,} rows)" if t in row_counts else ""))
                 print("B. Back")
                 
                 t_choice = input(f"\nSelect Table (1-{len(tables)}): ").strip().upper()
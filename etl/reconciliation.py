@@ -0,0 +1,137 @@
+import json
+import pandas as pd
+import schemas
+
+# The orders flowing through each layer, reconciled day by day (order_date):
+#   Raw     - the latest ingested version of each order (the one Curated keeps)
+#   Curated - fact_orders
+#   Gold    - sales_summary_daily (aggregates only, so it has no fingerprint)
+LAYERS = [('Raw', 'orders'), ('Curated', 'fact_orders'), ('Gold', 'sales_summary_daily')]
+
+# Business columns an order's fingerprint is computed over (system columns change on every load)
+FINGERPRINT_COLUMNS = [name for name, _ in schemas.CURATED_TABLES['fact_orders']['columns']
+                       if name not in schemas.SYSTEM_COLUMNS]
+
+SKETCH_COLUMNS = ['partition_date', 'row_count', 'amount_sum', 'fingerprint']
+
+# Sums of amounts are compared to the cent, as verify.py always has
+AMOUNT_TOLERANCE = 0.01
+
+IN_LIST = "IN (SELECT value FROM json_each(?))"
+
+def _on_days(table_name):
+    """FROM clause of a table's rows (as o) whose order_date falls on one of the days in a JSON list.
+    
+    Each day is a range search on the order_date index, rather than a scan of the table.
+    """
+    return f"""json_each(?) d CROSS JOIN "{table_name}" o ON o.order_date >= d.value AND o.order_date < date(d.value, '+1 day')"""
+
+def affected_days(raw_conn, curated_conn, batch_ids):
+    """Returns the order dates whose sketches the given batches may have changed.
+    
+    These are the days of the orders the batches ingested into Raw, the days any
+    earlier Raw version of those orders fell on, the days of the fact_orders rows
+    they inserted or updated, and the prior order dates recorded in change_log.
+    """
+    params = (json.dumps(batch_ids),)
+    days = {row[0] for row in raw_conn.execute(f"""
+        SELECT DISTINCT substr(order_date, 1, 10) FROM orders
+        WHERE order_id IN (SELECT order_id FROM orders WHERE batch_id {IN_LIST})
+    """, params)}
+    days.update(row[0] for row in curated_conn.execute(
+        f"SELECT DISTINCT substr(order_date, 1, 10) FROM fact_orders WHERE batch_id {IN_LIST}", params))
+    days.update(row[0][:10] for row in curated_conn.execute(f"""
+        SELECT prior_value FROM change_log
+        WHERE batch_id {IN_LIST} AND table_name = 'fact_orders' AND column_name = 'order_date'
+    """, params))
+    return sorted(day for day in days if day)
+
+def order_sketches(df):
+    """Sketches a frame of orders per order date: row count, amount sum and fingerprint.
+    
+    The fingerprint is the sum, modulo 2**64, of a 64-bit hash of each order's
+    business columns: it doesn't depend on row order, and two layers holding the
+    same orders get the same one whatever their column types or date formats.
+    """
+    dates = pd.to_datetime(df['order_date'], format='ISO8601', errors='coerce')
+    canonical = pd.DataFrame({
+        column: df[column].astype('string') for column in FINGERPRINT_COLUMNS
+    })
+    canonical['order_date'] = dates.dt.strftime('%Y-%m-%d %H:%M:%S').astype('string')
+    canonical['total_amount'] = pd.to_numeric(df['total_amount'], errors='coerce')
+    
+    days = dates.dt.strftime('%Y-%m-%d')
+    grouped = pd.DataFrame({
+        'row_count': 1,
+        'amount_sum': canonical['total_amount'],
+        'fingerprint': pd.util.hash_pandas_object(canonical, index=False),
+    }).groupby(days)
+    sketches = grouped.agg({'row_count': 'count', 'amount_sum': 'sum', 'fingerprint': 'sum'})
+    sketches['fingerprint'] = sketches['fingerprint'].map('{:016x}'.format)
+    return sketches.rename_axis('partition_date').reset_index()[SKETCH_COLUMNS]
+
+def raw_sketches(raw_conn, days=None):
+    """Sketches the latest Raw version of each order (highest rowid), for the given days or all of them."""
+    columns = ", ".join(f'"{c}"' for c in FINGERPRINT_COLUMNS)
+    if days is None:
+        df = pd.read_sql(f"SELECT {columns} FROM orders WHERE rowid IN (SELECT MAX(rowid) FROM orders GROUP BY order_id)", raw_conn)
+        return order_sketches(df)
+    # Versions of an order may fall on different days: take the latest of every order seen on
+    # one of the days, then keep those that (still) fall on one of them
+    df = pd.read_sql(f"""
+        SELECT {columns} FROM orders WHERE rowid IN (
+            SELECT MAX(rowid) FROM orders
+            WHERE order_id IN (SELECT o.order_id FROM {_on_days('orders')})
+            GROUP BY order_id
+        )
+    """, raw_conn, params=(json.dumps(days),))
+    sketches = order_sketches(df)
+    return sketches[sketches['partition_date'].isin(days)]
+
+def curated_sketches(curated_conn, days=None):
+    """Sketches fact_orders, for the given days or all of them."""
+    if days is None:
+        columns = ", ".join(f'"{c}"' for c in FINGERPRINT_COLUMNS)
+        return order_sketches(pd.read_sql(f"SELECT {columns} FROM fact_orders", curated_conn))
+    columns = ", ".join(f'o."{c}"' for c in FINGERPRINT_COLUMNS)
+    return order_sketches(pd.read_sql(f"SELECT {columns} FROM {_on_days('fact_orders')}",
+                                      curated_conn, params=(json.dumps(days),)))
+
+def gold_sketches(gold_conn, days=None):
+    """Reads the order count and sales of each day from sales_summary_daily, for the given days or all of them."""
+    sql = """
+        SELECT substr(order_date, 1, 10) AS partition_date, total_orders AS row_count,
+               total_sales AS amount_sum, NULL AS fingerprint
+        FROM sales_summary_daily
+    """
+    if days is None:
+        return pd.read_sql(sql, gold_conn)
+    return pd.read_sql(f"{sql} WHERE order_date {IN_LIST}", gold_conn, params=(json.dumps(days),))
+
+def compare(sketches):
+    """Compares the layers day by day and returns the days on which they diverge.
+    
+    sketches holds one row per layer and day, with a 'layer' column and SKETCH_COLUMNS.
+    Raw and Curated must agree on row count, amount sum and fingerprint; Curated and
+    Gold on row count and amount sum. Returns one row per diverging day with each
+    layer's count and sum, and the checks that failed in 'diverges'.
+    """
+    layers = [layer for layer, _ in LAYERS]
+    wide = sketches.pivot(index='partition_date', columns='layer', values=['row_count', 'amount_sum', 'fingerprint'])
+    counts = wide['row_count'].reindex(columns=layers).astype('float64').fillna(0).astype('int64')
+    sums = wide['amount_sum'].reindex(columns=layers).astype('float64').fillna(0)
+    fingerprints = wide['fingerprint'].reindex(columns=layers).fillna('')
+    
+    failed = pd.DataFrame({
+        'Raw/Curated rows': counts['Raw'] != counts['Curated'],
+        'Raw/Curated sum': (sums['Raw'] - sums['Curated']).abs() >= AMOUNT_TOLERANCE,
+        'Raw/Curated fingerprint': fingerprints['Raw'] != fingerprints['Curated'],
+        'Curated/Gold rows': counts['Curated'] != counts['Gold'],
+        'Curated/Gold sum': (sums['Curated'] - sums['Gold']).abs() >= AMOUNT_TOLERANCE,
+    })
+    failed = failed[failed.any(axis=1)]
+    
+    diverging = pd.concat([counts.add_suffix('_rows'), sums.add_suffix('_sum')], axis=1).loc[failed.index]
+    diverging.columns = [column.lower() for column in diverging.columns]
+    diverging['diverges'] = [", ".join(failed.columns[row]) for row in failed.to_numpy()]
+    return diverging.reset_index()
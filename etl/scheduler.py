@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import config
+
+class Stage:
+    """A pipeline step and the names of the steps that must finish before it starts."""
+    def __init__(self, name, func, depends_on=()):
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+
+def run_stages(stages, max_workers=None):
+    """Runs each stage as soon as all of its dependencies have succeeded.
+    
+    Ready stages run concurrently on a thread pool of config.MAX_WORKERS threads,
+    so wall-clock time follows the critical path of the graph. If a stage fails,
+    no new stages are started, running ones are allowed to finish and the first
+    error is re-raised. Returns a dict of stage name -> the stage's return value.
+    With a single worker the stages run one by one in the calling thread.
+    """
+    pending = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = [d for d in stage.depends_on if d not in pending]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stage(s): {missing}")
+    
+    max_workers = max_workers or config.MAX_WORKERS
+    if max_workers == 1:
+        return _run_in_order(pending)
+    
+    results = {}
+    running = {}
+    error = None
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            if error is None:
+                for name, stage in list(pending.items()):
+                    if all(d in results for d in stage.depends_on):
+                        running[pool.submit(stage.func)] = name
+                        del pending[name]
+            
+            if not running:
+                if error is None:
+                    raise ValueError(f"Circular stage dependencies: {sorted(pending)}")
+                break
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+    
+    if error is not None:
+        raise error
+    return results
+
+def _run_in_order(pending):
+    """Runs the stages sequentially in the calling thread, in dependency order; a failure is raised at once."""
+    results = {}
+    while pending:
+        ready = [name for name, stage in pending.items() if all(d in results for d in stage.depends_on)]
+        if not ready:
+            raise ValueError(f"Circular stage dependencies: {sorted(pending)}")
+        for name in ready:
+            results[name] = pending.pop(name).func()
+    return results
@@ -0,0 +1,387 @@
+"""Typed table definitions for the Raw, Curated and Gold zones.
+
+Curated tables are created once with a real primary key and then kept up to
+date with upserts (SCD Type 1), instead of being replaced on every run.
+Secondary indexes are declared per table under 'indexes' (and 'unique_indexes')
+as tuples of columns; they are built after a table is loaded, see
+bulk_writer.create_indexes.
+"""
+
+# Columns stamped by the pipeline rather than taken from the source.
+# They change on every load, so they are ignored when deciding whether a row changed.
+SYSTEM_COLUMNS = [
+    'ingestion_timestamp', 'batch_id', 'source_system', 'source_filename',
+    'process_name', 'transformation_timestamp'
+]
+
+_RAW_SYSTEM_COLUMNS = [
+    ('ingestion_timestamp', 'TEXT'),
+    ('batch_id', 'TEXT'),
+    ('source_system', 'TEXT'),
+    ('source_filename', 'TEXT'),
+]
+
+_INGESTION_COLUMNS = [('ingestion_timestamp', 'TIMESTAMP')] + _RAW_SYSTEM_COLUMNS[1:]
+
+# Raw tables: the source CSV columns as-is, plus the ingestion system columns.
+# Incremental Curated loads read Raw by batch_id, hence the index on it; the
+# reconciliation (see reconciliation.py) looks orders up by id and by day, and the
+# data quality checks look customers and products up by id.
+RAW_TABLES = {
+    'customers': {
+        'indexes': [('batch_id',), ('customer_id',)],
+        'columns': [
+            ('customer_id', 'TEXT'),
+            ('first_name', 'TEXT'),
+            ('last_name', 'TEXT'),
+            ('email', 'TEXT'),
+            ('phone', 'TEXT'),
+            ('city', 'TEXT'),
+            ('state', 'TEXT'),
+            ('country', 'TEXT'),
+            ('segment', 'TEXT'),
+        ] + _INGESTION_COLUMNS,
+    },
+    'products': {
+        'indexes': [('batch_id',), ('product_id',)],
+        'columns': [
+            ('product_id', 'TEXT'),
+            ('product_name', 'TEXT'),
+            ('category', 'TEXT'),
+            ('sub_category', 'TEXT'),
+            ('brand', 'TEXT'),
+            ('unit_price', 'REAL'),
+            ('status', 'TEXT'),
+        ] + _INGESTION_COLUMNS,
+    },
+    'orders': {
+        'indexes': [('batch_id',), ('order_id',), ('order_date',)],
+        'columns': [
+            ('order_id', 'TEXT'),
+            ('customer_id', 'TEXT'),
+            ('order_date', 'TEXT'),
+            ('channel', 'TEXT'),
+            ('total_amount', 'REAL'),
+            ('status', 'TEXT'),
+        ] + _INGESTION_COLUMNS,
+    },
+    'order_lines': {
+        'indexes': [('batch_id',)],
+        'columns': [
+            ('order_line_id', 'TEXT'),
+            ('order_id', 'TEXT'),
+            ('product_id', 'TEXT'),
+            ('quantity', 'INTEGER'),
+            ('unit_price', 'REAL'),
+            ('discount_amount', 'REAL'),
+        ] + _INGESTION_COLUMNS,
+    },
+    'payments': {
+        'indexes': [('batch_id',)],
+        'columns': [
+            ('payment_id', 'TEXT'),
+            ('order_id', 'TEXT'),
+            ('payment_date', 'TEXT'),
+            ('payment_method', 'TEXT'),
+            ('payment_status', 'TEXT'),
+            ('payment_amount', 'REAL'),
+        ] + _INGESTION_COLUMNS,
+    },
+}
+
+# pandas dtypes for the columns of each source table once it is read into a DataFrame
+# (Raw -> Curated, Curated -> Gold); Curated tables use the dtypes of their 'source'.
+#   'category' - low-cardinality text and IDs repeated across many rows
+#   'integer'  - counts, downcast to the smallest integer type that holds them
+#   'datetime' / 'date' - parsed once at read time ('date' is written back without a time)
+# Unlisted columns keep pandas' defaults; amounts stay float64 so sums don't change.
+SOURCE_DTYPES = {
+    'customers': {
+        'state': 'category',
+        'country': 'category',
+        'segment': 'category',
+    },
+    'products': {
+        'category': 'category',
+        'sub_category': 'category',
+        'brand': 'category',
+        'status': 'category',
+    },
+    'orders': {
+        'customer_id': 'category',
+        'order_date': 'datetime',
+        'channel': 'category',
+        'status': 'category',
+    },
+    'order_lines': {
+        'product_id': 'category',
+        'quantity': 'integer',
+    },
+    'payments': {
+        'payment_date': 'date',
+        'payment_method': 'category',
+        'payment_status': 'category',
+    },
+}
+
+CURATED_TABLES = {
+    'dim_customers': {
+        'source': 'customers',
+        'primary_key': 'customer_id',
+        'columns': [
+            ('customer_id', 'TEXT'),
+            ('first_name', 'TEXT'),
+            ('last_name', 'TEXT'),
+            ('email', 'TEXT'),
+            ('phone', 'TEXT'),
+            ('city', 'TEXT'),
+            ('state', 'TEXT'),
+            ('country', 'TEXT'),
+            ('segment', 'TEXT'),
+        ] + _RAW_SYSTEM_COLUMNS + [
+            ('process_name', 'TEXT'),
+            ('transformation_timestamp', 'TIMESTAMP'),
+        ],
+    },
+    'dim_products': {
+        'source': 'products',
+        'primary_key': 'product_id',
+        'columns': [
+            ('product_id', 'TEXT'),
+            ('product_name', 'TEXT'),
+            ('category', 'TEXT'),
+            ('sub_category', 'TEXT'),
+            ('brand', 'TEXT'),
+            ('unit_price', 'REAL'),
+            ('status', 'TEXT'),
+        ] + _RAW_SYSTEM_COLUMNS + [
+            ('transformation_timestamp', 'TIMESTAMP'),
+        ],
+    },
+    'fact_orders': {
+        'source': 'orders',
+        'primary_key': 'order_id',
+        'indexes': [('customer_id',), ('order_date',), ('batch_id',)],
+        'tracked_columns': ['order_date', 'customer_id'],
+        'columns': [
+            ('order_id', 'TEXT'),
+            ('customer_id', 'TEXT'),
+            ('order_date', 'TIMESTAMP'),
+            ('channel', 'TEXT'),
+            ('total_amount', 'REAL'),
+            ('status', 'TEXT'),
+        ] + _RAW_SYSTEM_COLUMNS + [
+            ('transformation_timestamp', 'TIMESTAMP'),
+        ],
+    },
+    'fact_order_lines': {
+        'source': 'order_lines',
+        'primary_key': 'order_line_id',
+        'indexes': [('order_id',), ('product_id',)],
+        'tracked_columns': ['order_id'],
+        'columns': [
+            ('order_line_id', 'TEXT'),
+            ('order_id', 'TEXT'),
+            ('product_id', 'TEXT'),
+            ('quantity', 'INTEGER'),
+            ('unit_price', 'REAL'),
+            ('discount_amount', 'REAL'),
+        ] + _RAW_SYSTEM_COLUMNS + [
+            ('transformation_timestamp', 'TIMESTAMP'),
+        ],
+    },
+    'fact_payments': {
+        'source': 'payments',
+        'primary_key': 'payment_id',
+        'indexes': [('order_id',)],
+        'tracked_columns': ['order_id'],
+        'columns': [
+            ('payment_id', 'TEXT'),
+            ('order_id', 'TEXT'),
+            ('payment_date', 'DATE'),
+            ('payment_method', 'TEXT'),
+            ('payment_status', 'TEXT'),
+            ('payment_amount', 'REAL'),
+        ] + _RAW_SYSTEM_COLUMNS + [
+            ('transformation_timestamp', 'TIMESTAMP'),
+        ],
+    },
+}
+
+# Prior values of 'tracked_columns' overwritten by an upsert. An order that moves to
+# another date or customer (or a line/payment that moves to another order) leaves
+# stale Gold rows under its old key; the incremental Gold build reads these to find them.
+CHANGE_LOG_SQL = """
+    CREATE TABLE IF NOT EXISTS change_log (
+        batch_id TEXT,
+        table_name TEXT,
+        key_value TEXT,
+        column_name TEXT,
+        prior_value TEXT
+    )
+"""
+CHANGE_LOG_INDEX_SQL = 'CREATE INDEX IF NOT EXISTS "idx_change_log_batch_id" ON change_log ("batch_id")'
+
+# Columns of the reporting_sales_wide One Big Table, in order. Columns that none
+# of the joined Curated tables provide (e.g. line_total) are left out.
+REPORTING_WIDE_COLUMNS = [
+    'order_id', 'order_date', 'status', 'total_amount',
+    'product_name', 'category', 'sub_category', 'brand', 'quantity', 'line_total',
+    'first_name', 'last_name', 'city', 'state', 'segment',
+    'payment_method', 'payment_amount'
+]
+
+_GOLD_SYSTEM_COLUMNS = [
+    ('batch_id', 'TEXT'),
+    ('aggregation_timestamp', 'TIMESTAMP'),
+]
+
+# Suffix of the staging copy a table is built in before it is published
+# (see bulk_writer.publish_staged). A staging table has its table's columns but
+# no primary key: it may hold several versions of a row, merged on publish.
+STAGING_SUFFIX = '__staging'
+
+# Suffix of the Raw table that rows failing the data quality rules are moved to
+# (see data_quality.py), with the rules they broke in dq_violations.
+QUARANTINE_SUFFIX = '__quarantine'
+
+# Gold tables, typed the way DataFrame.to_sql creates them from the pandas builders.
+GOLD_TABLES = {
+    'sales_summary_daily': {
+        'unique_indexes': [('order_date',)],
+        'indexes': [('total_sales',)],
+        'columns': [
+            ('order_date', 'DATE'),
+            ('total_sales', 'REAL'),
+            ('total_orders', 'INTEGER'),
+            ('unique_customers', 'INTEGER'),
+            ('date', 'DATE'),
+        ] + _GOLD_SYSTEM_COLUMNS,
+    },
+    'reporting_sales_wide': {
+        'indexes': [('order_id',), ('order_date',)],
+        'columns': [
+            ('order_id', 'TEXT'),
+            ('order_date', 'TIMESTAMP'),
+            ('status', 'TEXT'),
+            ('total_amount', 'REAL'),
+            ('product_name', 'TEXT'),
+            ('category', 'TEXT'),
+            ('sub_category', 'TEXT'),
+            ('brand', 'TEXT'),
+            ('quantity', 'INTEGER'),
+            ('line_total', 'REAL'),
+            ('first_name', 'TEXT'),
+            ('last_name', 'TEXT'),
+            ('city', 'TEXT'),
+            ('state', 'TEXT'),
+            ('segment', 'TEXT'),
+            ('payment_method', 'TEXT'),
+            ('payment_amount', 'REAL'),
+        ] + _GOLD_SYSTEM_COLUMNS,
+    },
+    'reporting_customer_stats': {
+        'unique_indexes': [('customer_id',)],
+        'columns': [
+            ('customer_id', 'TEXT'),
+            ('first_order', 'TIMESTAMP'),
+            ('last_order', 'TIMESTAMP'),
+            ('total_spend', 'REAL'),
+            ('orders_count', 'INTEGER'),
+            ('first_name', 'TEXT'),
+            ('last_name', 'TEXT'),
+            ('email', 'TEXT'),
+        ] + _GOLD_SYSTEM_COLUMNS,
+    },
+    # Rollups for dashboards, so their common queries never scan reporting_sales_wide.
+    # Weeks run Monday to Sunday; orders without an order_date are left out, as in
+    # sales_summary_daily.
+    'sales_summary_weekly': {
+        'unique_indexes': [('week_start',)],
+        'columns': [
+            ('week_start', 'DATE'),
+            ('total_sales', 'REAL'),
+            ('total_orders', 'INTEGER'),
+            ('unique_customers', 'INTEGER'),
+        ] + _GOLD_SYSTEM_COLUMNS,
+    },
+    'sales_summary_monthly': {
+        'unique_indexes': [('order_month',)],
+        'columns': [
+            ('order_month', 'TEXT'),
+            ('total_sales', 'REAL'),
+            ('total_orders', 'INTEGER'),
+            ('unique_customers', 'INTEGER'),
+        ] + _GOLD_SYSTEM_COLUMNS,
+    },
+    # Line sales (quantity x unit_price - discount_amount) per month, category and brand
+    'sales_by_category_brand': {
+        'indexes': [('order_month',), ('category', 'brand')],
+        'columns': [
+            ('order_month', 'TEXT'),
+            ('category', 'TEXT'),
+            ('brand', 'TEXT'),
+            ('total_sales', 'REAL'),
+            ('total_quantity', 'INTEGER'),
+            ('total_orders', 'INTEGER'),
+        ] + _GOLD_SYSTEM_COLUMNS,
+    },
+}
+
+
+def staging_table(table_name):
+    """Returns the name of table_name's staging table."""
+    return f"{table_name}{STAGING_SUFFIX}"
+
+
+def quarantine_table(table_name):
+    """Returns the name of a Raw table's quarantine table."""
+    return f"{table_name}{QUARANTINE_SUFFIX}"
+
+
+def table_spec(table_name):
+    """Returns the definition of a Raw, Curated or Gold table (or of its staging table), or None if it has none."""
+    table_name = table_name.removesuffix(STAGING_SUFFIX)
+    for tables in (RAW_TABLES, CURATED_TABLES, GOLD_TABLES):
+        if table_name in tables:
+            return tables[table_name]
+    return None
+
+
+def frame_dtypes(table_name):
+    """Returns the SOURCE_DTYPES of a source or Curated table ({} if none are declared)."""
+    source = CURATED_TABLES.get(table_name, {}).get('source', table_name)
+    return SOURCE_DTYPES.get(source, {})
+
+
+def create_table_sql(table_name, columns=None):
+    """Builds the CREATE TABLE statement for a table, including its primary key (staging tables have none).
+    
+    columns optionally overrides the defined (column, type) pairs, e.g. to create
+    a table with only a subset of its columns.
+    """
+    spec = table_spec(table_name) or {}
+    columns = spec['columns'] if columns is None else columns
+    column_defs = [f'"{name}" {col_type}' for name, col_type in columns]
+    if 'primary_key' in spec and not table_name.endswith(STAGING_SUFFIX):
+        column_defs.append(f'PRIMARY KEY ("{spec["primary_key"]}")')
+    return f'CREATE TABLE IF NOT EXISTS "{table_name}" (\n  ' + ",\n  ".join(column_defs) + "\n)"
+
+
+def index_sql(table_name):
+    """Returns (index name, columns, CREATE INDEX statement) for each index declared on a table.
+    
+    Staging tables get none: index names stay with a renamed table, so a table's
+    indexes are only built once it has been published under its own name.
+    """
+    if table_name.endswith(STAGING_SUFFIX):
+        return []
+    spec = table_spec(table_name) or {}
+    indexes = []
+    for unique, key in ((True, 'unique_indexes'), (False, 'indexes')):
+        for columns in spec.get(key, []):
+            name = f"{'uq' if unique else 'idx'}_{table_name}_{'_'.join(columns)}"
+            column_list = ", ".join(f'"{c}"' for c in columns)
+            indexes.append((name, columns, f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS "{name}" '
+                                           f'ON "{table_name}" ({column_list})'))
+    return indexes
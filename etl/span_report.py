@@ -0,0 +1,55 @@
+import argparse
+import pandas as pd
+import config
+from config import AUDIT_DB_PATH
+
+SLOWEST_SPANS_SQL = """
+    WITH recent_batches AS (
+        SELECT batch_id, MIN(start_time) AS batch_start
+        FROM pipeline_execution_log
+        GROUP BY batch_id
+        ORDER BY batch_start DESC
+        LIMIT ?
+    )
+    SELECT b.batch_start, l.process_name AS stage, s.step, s.table_name, s.status,
+           s.duration_seconds AS seconds, s.rows_in, s.rows_out, s.rows_per_sec,
+           s.bytes_read / 1048576.0 AS mb_read, s.peak_rss_mb, l.batch_id
+    FROM pipeline_span_log s
+    JOIN pipeline_execution_log l ON l.execution_id = s.execution_id
+    JOIN recent_batches b ON b.batch_id = l.batch_id
+    WHERE (? IS NULL OR s.step = ?)
+    ORDER BY s.duration_seconds DESC
+    LIMIT ?
+"""
+
+def slowest_spans(batches=5, limit=20, step=None):
+    """Returns the slowest spans (read/transform/write of a table) of the last N batches as a DataFrame."""
+    conn = config.get_db_connection(AUDIT_DB_PATH)
+    try:
+        return pd.read_sql(SLOWEST_SPANS_SQL, conn, params=(batches, step, step, limit))
+    finally:
+        conn.close()
+
+def print_report(batches=5, limit=20, step=None):
+    spans = slowest_spans(batches, limit, step)
+    print(f"--- Slowest Spans (last {batches} batches{f', step {step}' if step else ''}) ---")
+    if spans.empty:
+        print("No spans logged yet. Run etl_pipeline.py first.")
+        return spans
+    
+    spans['batch_id'] = spans['batch_id'].str[:8]
+    for col in ['rows_in', 'rows_out']:
+        spans[col] = spans[col].astype('Int64')
+    for col in ['seconds', 'rows_per_sec', 'mb_read', 'peak_rss_mb']:
+        spans[col] = spans[col].astype('float64')
+    print(spans.to_string(index=False, float_format=lambda v: f"{v:,.2f}", na_rep="-"))
+    return spans
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Slowest pipeline sub-steps (spans) across recent batches")
+    parser.add_argument("--batches", type=int, default=5, help="Number of most recent batches to include (default 5).")
+    parser.add_argument("--limit", type=int, default=20, help="Number of spans to show (default 20).")
+    parser.add_argument("--step", choices=["checksum", "read", "validate", "transform", "write", "build", "cache", "publish", "catalog"],
+                        help="Only show spans of this step.")
+    args = parser.parse_args()
+    print_report(args.batches, args.limit, args.step)
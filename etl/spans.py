@@ -0,0 +1,123 @@
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import config
+
+def current_rss_mb():
+    """Resident memory of this process in MB (the peak so far where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1024 ** 2
+    except (OSError, IndexError, ValueError):
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+class _RssSampler:
+    """Samples the process RSS every config.SPAN_SAMPLE_INTERVAL seconds while any span is timing.
+    
+    RSS is process-wide, so a span's peak includes whatever ran next to it in other threads.
+    """
+    def __init__(self):
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, span):
+        rss = current_rss_mb()
+        with self._lock:
+            self._active[id(span)] = span
+            span.peak_rss_mb = max(span.peak_rss_mb or 0.0, rss)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-rss-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def remove(self, span):
+        rss = current_rss_mb()
+        with self._lock:
+            self._active.pop(id(span), None)
+            span.peak_rss_mb = max(span.peak_rss_mb or 0.0, rss)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+                    continue
+            rss = current_rss_mb()
+            with self._lock:
+                for span in self._active.values():
+                    span.peak_rss_mb = max(span.peak_rss_mb or 0.0, rss)
+            time.sleep(config.SPAN_SAMPLE_INTERVAL)
+
+_sampler = _RssSampler()
+
+class Span:
+    """One sub-step of a pipeline stage: reading, transforming or writing one table.
+    
+    Time only counts inside timed() blocks, so a step interleaved with others (e.g.
+    the chunks of a streamed CSV) can be timed piece by piece. rows_in, rows_out
+    and bytes_read are filled in by the code being measured; AuditManager.record_span
+    stores the result in pipeline_span_log.
+    """
+    def __init__(self, step, table_name=None):
+        self.step = step
+        self.table_name = table_name
+        self.start_time = None
+        self.seconds = 0.0
+        self.rows_in = None
+        self.rows_out = None
+        self.bytes_read = None
+        self.peak_rss_mb = None
+        self.status = 'SUCCESS'
+
+    @contextmanager
+    def timed(self):
+        """Adds the time spent in the block to the span and tracks peak RSS meanwhile."""
+        if self.start_time is None:
+            self.start_time = datetime.now()
+        _sampler.add(self)
+        started = time.perf_counter()
+        try:
+            yield self
+        except Exception:
+            self.status = 'FAILED'
+            raise
+        finally:
+            self.seconds += time.perf_counter() - started
+            _sampler.remove(self)
+
+    def add_rows(self, rows_in=None, rows_out=None):
+        """Adds to the row counts (for steps measured chunk by chunk)."""
+        if rows_in is not None:
+            self.rows_in = (self.rows_in or 0) + rows_in
+        if rows_out is not None:
+            self.rows_out = (self.rows_out or 0) + rows_out
+
+    @property
+    def rows_per_sec(self):
+        rows = self.rows_out if self.rows_out is not None else self.rows_in
+        if rows is None or self.seconds <= 0:
+            return None
+        return rows / self.seconds
+
+def timed_chunks(chunks, span):
+    """Yields the chunks of a lazy iterable, timing the work of producing each one in span."""
+    iterator = iter(chunks)
+    while True:
+        with span.timed():
+            chunk = next(iterator, None)
+        if chunk is None:
+            return
+        span.add_rows(rows_out=len(chunk))
+        yield chunk
+
+def untracked(step, table_name=None):
+    """Stands in for AuditManager.span where nothing is logged: times the block into a throwaway Span."""
+    return Span(step, table_name).timed()
@@ -1,30 +1,72 @@
 import pandas as pd
+import argparse
 import config
 import sqlite3
-from config import GOLD_DB_PATH, CURATED_DB_PATH
+import reconciliation
+from config import RAW_DB_PATH, CURATED_DB_PATH, GOLD_DB_PATH
+from gold_store import open_gold_store
 
-def verify_data():
-    print("--- Verifying Gold Zone Data ---")
+STORED_SKETCHES_SQL = """
+    SELECT layer, table_name, partition_date, row_count, amount_sum, fingerprint
+    FROM reconciliation_sketch
+"""
+
+def _rescan_sketches(raw_conn, curated_conn):
+    """Sketches every day of every layer from the tables themselves (full scans)."""
     gold_conn = config.get_db_connection(GOLD_DB_PATH)
+    try:
+        readers = [(reconciliation.raw_sketches, raw_conn), (reconciliation.curated_sketches, curated_conn),
+                   (reconciliation.gold_sketches, gold_conn)]
+        return pd.concat([
+            read_sketches(conn).assign(layer=layer, table_name=table_name)
+            for (layer, table_name), (read_sketches, conn) in zip(reconciliation.LAYERS, readers)
+        ], ignore_index=True)
+    finally:
+        gold_conn.close()
+
+def _stale_days(stored, rescanned):
+    """Returns the days whose stored sketch differs from a fresh one (the incremental updates missed a change)."""
+    keys = ['layer', 'partition_date']
+    merged = stored.merge(rescanned, on=keys, how='outer', suffixes=('_stored', '_rescanned'))
+    stale = ((merged['row_count_stored'] != merged['row_count_rescanned'])
+             | ((merged['amount_sum_stored'] - merged['amount_sum_rescanned']).abs() >= reconciliation.AMOUNT_TOLERANCE)
+             | (merged['fingerprint_stored'].fillna('') != merged['fingerprint_rescanned'].fillna('')))
+    return sorted(merged.loc[stale, 'partition_date'].unique())
+
+def print_reconciliation(sketches):
+    """Prints the per-day reconciliation of Raw -> Curated -> Gold and returns the diverging days."""
+    print(f"\nReconciliation by Order Date (Raw -> Curated -> Gold):")
+    totals = sketches.groupby('layer')[['row_count', 'amount_sum']].sum()
+    for layer, _ in reconciliation.LAYERS:
+        if layer in totals.index:
+            print(f"  {layer}: {int(totals.loc[layer, 'row_count'])} orders, {totals.loc[layer, 'amount_sum']:.2f} sales")
+    
+    diverging = reconciliation.compare(sketches)
+    days = sketches['partition_date'].nunique()
+    if diverging.empty:
+        print(f"  -> MATCHED: all {days} days agree across layers. Data integrity verified.")
+    else:
+        print(f"  -> MISMATCH on {len(diverging)} of {days} days:")
+        print(diverging.to_string(index=False))
+    return diverging
+
+def verify_data(backend=None, rescan=False):
+    gold_store = open_gold_store(backend)
+    print(f"--- Verifying Gold Zone Data ({gold_store.name}: {gold_store.location}) ---")
     curated_conn = config.get_db_connection(CURATED_DB_PATH)
     
     try:
         # Check Daily Sales
         print("\n[Sales Summary Daily] (First 5 rows):")
-        daily_sales = pd.read_sql("SELECT * FROM sales_summary_daily LIMIT 5", gold_conn)
+        daily_sales = gold_store.read_table("sales_summary_daily", limit=5)
         print(daily_sales)
         
-        # Verify Total Sales consistency
-        gold_total = pd.read_sql("SELECT SUM(total_sales) as total FROM sales_summary_daily", gold_conn).iloc[0]['total']
-        curated_total = pd.read_sql("SELECT SUM(total_amount) as total FROM fact_orders", curated_conn).iloc[0]['total']
-        
         # Verify Metadata exists
-        raw_conn = config.get_db_connection(config.RAW_DB_PATH)
+        raw_conn = config.get_db_connection(RAW_DB_PATH)
         raw_row = pd.read_sql("SELECT ingestion_timestamp, batch_id FROM orders LIMIT 1", raw_conn).iloc[0]
         print(f"\nMetadata Check:")
         print(f"  Raw Ingestion Timestamp: {raw_row['ingestion_timestamp']}")
         print(f"  Batch ID: {raw_row['batch_id']}")
-        raw_conn.close()
         
         # Verify Audit Log
         audit_conn = sqlite3.connect(config.AUDIT_DB_PATH)
@@ -40,32 +82,51 @@ def verify_data():
         except Exception:
             print("  -> Table not found (Expected if first run just finished)")
         
+        # Per-day sketches kept up to date by the pipeline's Reconcile step, so no layer is scanned
+        try:
+            sketches = pd.read_sql(STORED_SKETCHES_SQL, audit_conn)
+        except Exception:
+            sketches = pd.DataFrame()
         audit_conn.close()
         
-        print(f"\nTotal Sales Consistency Check:")
-        print(f"  Gold (Daily Sum): {gold_total}")
-        print(f"  Curated (Orders Sum): {curated_total}")
+        if rescan:
+            rescanned = _rescan_sketches(raw_conn, curated_conn)
+            if not sketches.empty:
+                stale = _stale_days(sketches, rescanned)
+                if stale:
+                    print(f"\nStored Sketches: out of date on {len(stale)} days: {', '.join(stale)}")
+                else:
+                    print("\nStored Sketches: up to date")
+            sketches = rescanned
+        raw_conn.close()
         
-        if abs(gold_total - curated_total) < 0.01:
-            print("  -> MATCHED: Data integrity verified.")
+        if sketches.empty:
+            print("\nReconciliation: no sketches recorded yet (run etl_pipeline.py, or verify.py --rescan).")
         else:
-            print("  -> MISMATCH: Check aggregation logic.")
-            
+            print_reconciliation(sketches)
+        
         # Verify Wide Reporting Table
         print("\n[Reporting Sales Wide] (First 5 rows):")
-        wide_df = pd.read_sql("SELECT order_id, total_amount, product_name, category, payment_method FROM reporting_sales_wide LIMIT 5", gold_conn)
+        wide_df = gold_store.read_table("reporting_sales_wide",
+                                        columns=["order_id", "total_amount", "product_name", "category", "payment_method"], limit=5)
         print(wide_df)
         
         # Verify Customer Stats
         print("\n[Reporting Customer Stats] (First 5 rows):")
-        cust_stats = pd.read_sql("SELECT * FROM reporting_customer_stats LIMIT 5", gold_conn)
+        cust_stats = gold_store.read_table("reporting_customer_stats", limit=5)
         print(cust_stats)
-            
+    
 
 
     finally:
-        gold_conn.close()
         curated_conn.close()
 
 if __name__ == "__main__":
-    verify_data()
+    parser = argparse.ArgumentParser(description="Verify the Gold zone against Curated")
+    parser.add_argument("--backend", choices=["sqlite", "parquet"],
+                        help="Gold storage backend to read (default: config.GOLD_BACKEND).")
+    parser.add_argument("--rescan", action="store_true",
+                        help="Sketch every day from the Raw, Curated and Gold tables (full scans) instead of using the "
+                             "sketches stored by the pipeline, and report stored sketches that are out of date.")
+    args = parser.parse_args()
+    verify_data(args.backend, args.rescan)
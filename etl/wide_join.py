@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import config
+import schemas
+
+def _positions(key_index, keys):
+    """Row position in key_index of each key (-1 where absent).
+    
+    Categorical keys are looked up once per category and then mapped through
+    their integer codes, instead of hashing every row's value.
+    """
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        # The trailing -1 is what code -1 (a missing key) maps to
+        category_positions = np.append(key_index.get_indexer(keys.cat.categories), -1)
+        return category_positions[keys.cat.codes.to_numpy()]
+    return key_index.get_indexer(keys)
+
+def _group_by_position(positions):
+    """Sorts row numbers by their (non-negative) position, keeping file order within a position.
+    
+    Returns (rows, sorted positions) for the rows whose position is >= 0.
+    """
+    rows = np.flatnonzero(positions >= 0)
+    rows = rows[np.argsort(positions[rows], kind="stable")]
+    return rows, positions[rows]
+
+def iter_wide_chunks(fact_orders, fact_lines, dim_products, dim_customers, fact_payments, chunk_orders=None):
+    """Yields reporting_sales_wide in chunks of config.WIDE_CHUNK_ORDERS orders.
+    
+    Gives the same rows, in the same order, as the merge chain
+    orders -> lines -> products -> customers (inner) -> payments (left), but:
+    - only the schemas.REPORTING_WIDE_COLUMNS are carried, each taken from the
+      first table that has it (as the merge suffixes did);
+    - lines are matched to orders, products and customers through key -> row
+      position indexes built once, and every column is gathered with a single take;
+    - a chunk's rows exist only while that chunk is being yielded.
+    Always yields at least one (possibly empty) frame.
+    """
+    chunk_orders = chunk_orders or config.WIDE_CHUNK_ORDERS
+    tables = [fact_orders, fact_lines, dim_products, dim_customers, fact_payments]
+    source_of = {}
+    for i, table in enumerate(tables):
+        for column in table.columns:
+            source_of.setdefault(column, i)
+    columns = [c for c in schemas.REPORTING_WIDE_COLUMNS if c in source_of]
+    
+    # Lines grouped by their order's position; inner joins drop lines without a match
+    order_index = pd.Index(fact_orders['order_id'])
+    line_rows, line_orders = _group_by_position(_positions(order_index, fact_lines['order_id']))
+    line_products = _positions(pd.Index(dim_products['product_id']), fact_lines['product_id'])[line_rows]
+    order_customers = _positions(pd.Index(dim_customers['customer_id']), fact_orders['customer_id'])
+    line_customers = order_customers[line_orders]
+    matched = (line_products >= 0) & (line_customers >= 0)
+    line_rows, line_orders = line_rows[matched], line_orders[matched]
+    line_products, line_customers = line_products[matched], line_customers[matched]
+    
+    # Payments grouped by order position: payment_starts[o] .. + payment_counts[o]
+    payment_rows, payment_orders = _group_by_position(_positions(order_index, fact_payments['order_id']))
+    payment_counts = np.bincount(payment_orders, minlength=len(order_index))
+    payment_starts = np.cumsum(payment_counts) - payment_counts
+    
+    order_bounds = [0] + list(range(chunk_orders, len(order_index), chunk_orders)) + [len(order_index)]
+    chunk_bounds = np.searchsorted(line_orders, order_bounds)
+    for start, end in zip(chunk_bounds[:-1], chunk_bounds[1:]):
+        if start == end and start > 0:
+            continue
+        orders = line_orders[start:end]
+        
+        # Left join: each line repeats once per payment of its order (once if it has none)
+        counts = payment_counts[orders]
+        repeats = np.maximum(counts, 1)
+        out = np.repeat(np.arange(end - start), repeats)
+        nth_payment = np.arange(len(out)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        if len(payment_rows):
+            slot = np.minimum(payment_starts[orders][out] + nth_payment, len(payment_rows) - 1)
+            payments = np.where(counts[out] > 0, payment_rows[slot], -1)
+        else:
+            payments = np.full(len(out), -1)
+        
+        positions = [orders[out], line_rows[start:end][out], line_products[start:end][out],
+                     line_customers[start:end][out], payments]
+        yield pd.DataFrame({
+            column: tables[source_of[column]][column].array.take(positions[source_of[column]], allow_fill=True)
+            for column in columns
+        })